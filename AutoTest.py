@@ -1,7 +1,13 @@
 import sys
 import os
 import re
+import io
+import time
+import json
 import filecmp
+import importlib
+import contextlib
+import traceback
 import EE20084_functions_01 as EE84
 import numpy as np
 
@@ -80,9 +86,26 @@ def test_float_equality(logfile,nline,l1,l2,atol,rtol):
         logfile.write(st)
     return(error_in_line)
 
+def read_floats(lines):
+    """ Reads the values from the data lines of an output (.csv) file into an array in one pass
+    :param lines - list of the lines of text holding the values
+    :return - 2D float array with one row per line, or None if the lines have different
+        numbers of values or a value is not a number
+    """
+    if len(lines)==0:
+        return(np.zeros((0,0)))
+    try:
+        values=np.loadtxt(io.StringIO("\n".join(lines)),delimiter=",",ndmin=2,comments=None)
+    except ValueError:
+        return(None)
+    if values.shape[0]!=len(lines):
+        return(None)
+    return(values)
+
 def test_equality(logfile,f1,f2,atol,rtol):
     """ Test for equality between contents of two output (.csv) files
     When differences are found files are compared character by character and float by float to identify where first difference occurs
+    The values of all lines are first tested together, only lines that fail are compared in detail
         Outputs messages to log file.
     :param logfile - file pointer to opened file for log messages
     :param f1 - text contents of file one
@@ -104,12 +127,26 @@ def test_equality(logfile,f1,f2,atol,rtol):
         err_file=line1_err or err_file
         line2_err=test_char_by_char(logfile,2, f1split[1], f2split[1])
         err_file=line2_err or err_file
+        values1=read_floats(f1split[2:])
+        values2=read_floats(f2split[2:])
+        if (values1 is not None) and (values2 is not None) and (values1.shape==values2.shape):
+            # One array-wide tolerance test, only the lines that fail it are tested line by line
+            lines_ok=np.isclose(values1,values2,atol,rtol).all(axis=1)
+        else:
+            lines_ok=np.zeros(nlines1-2,dtype=bool)
+        messages=[]
         for iline in range(2,nlines1):
+            if lines_ok[iline-2]:
+                messages.append("Line %d is OK\n"%(iline+1))
+                continue
+            logfile.write("".join(messages))
+            messages=[]
             float_err=test_float_equality(logfile, (iline+1), f1split[iline], f2split[iline], atol, rtol)
             err_file=float_err or err_file
             if (float_err):
                 line_err=test_char_by_char(logfile,(1+iline), f1split[iline], f2split[iline])
                 err_file=line_err or err_file
+        logfile.write("".join(messages))
     else:
         err_file=True
         st="Files have different number of lines, model has %d lines, user has %d lines\n"%(nlines1,nlines2)
@@ -118,13 +155,92 @@ def test_equality(logfile,f1,f2,atol,rtol):
     
 
 
-def run_tests(test_names,atol,rtol):
+def load_program(program_name):
+    """ Imports the program under test so that it can be run in-process, without
+    starting a new Python interpreter for every test. Only programs that provide
+    simulate() and WriteResult() (and so do nothing when imported) are loaded.
+    :param program_name - file name of the program, e.g. Main.py
+    :return - the imported module, or None if the tests have to run it as a command
+    """
+    program_path=os.path.abspath(program_name)
+    try:
+        program_file=EE84.My_open_file(program_path,"rt")
+    except SystemExit:
+        return(None)
+    source=program_file.read()
+    program_file.close()
+    if ("def simulate(" not in source) or ("def WriteResult(" not in source):
+        return(None)
+    folder,filename=os.path.split(program_path)
+    if folder not in sys.path:
+        sys.path.insert(0,folder)
+    try:
+        return(importlib.import_module(os.path.splitext(filename)[0]))
+    except Exception:
+        return(None)
+
+def run_in_process(program,net_file,output_file,run_log):
+    """ Runs the program under test in-process on one netlist.
+    The output is kept in memory for the comparison, and is also written to the output file
+    and anything the program prints goes to the run log, the same as running it as a command.
+    :param program - module returned by load_program
+    :param net_file - name of the input .net file
+    :param output_file - name of the output .csv file
+    :param run_log - name of the file for the printed messages
+    :return - True if the program failed, text of the output file
+    """
+    messages=io.StringIO()
+    output=io.StringIO()
+    with contextlib.redirect_stdout(messages), contextlib.redirect_stderr(messages):
+        try:
+            error,result=program.simulate(net_file)
+            if not error:
+                program.WriteResult(output,result)
+        except ValueError:
+            error=True
+        except Exception:
+            error=True
+            traceback.print_exc()
+    output_text="" if error else output.getvalue()
+    out_file=EE84.My_open_file(output_file,"wt")
+    out_file.write(output_text)
+    out_file.close()
+    log_file=EE84.My_open_file(run_log,"wt")
+    log_file.write(messages.getvalue())
+    log_file.close()
+    return(error,output_text)
+
+def run_program(program,net_file,output_file,run_log):
+    """ Runs the program under test once on one netlist and times it
+    :param program - module returned by load_program to run it in-process, None to run it as a command
+    :param net_file - name of the input .net file
+    :param output_file - name of the output .csv file
+    :param run_log - name of the file for the printed messages
+    :return - the command, the message saying how it finished, the output text (None when run
+        as a command, it is then only in the output file) and the time taken in seconds
+    """
+    start=time.perf_counter()
+    if program is None:
+        st='python %s %s %s >%s 2>&1'%(sys.argv[1],net_file,output_file,run_log)
+        os_rtn=os.system(st)
+        rtn_message="OS returns %r from execution of command\n"%(os_rtn)
+        output_text=None
+    else:
+        st='%s %s %s (in-process) >%s'%(sys.argv[1],net_file,output_file,run_log)
+        run_error,output_text=run_in_process(program,net_file,output_file,run_log)
+        rtn_message="In-process run returns error=%r\n"%(run_error)
+    return(st,rtn_message,output_text,time.perf_counter()-start)
+
+def run_tests(test_names,atol,rtol,program=None,timings=None,repeats=1):
     """ Run a set of tests with the same absolute and relative tolerances
     Calls test_equality to make the equality test between contents of two output (.csv) files
         Opens log file to catch log messages.
     :param test_names - list of data file names - input and output filenames are generated from this
     :param atol - absolute tolerance for isclose equality test
     :param rtol - relative tolerance for isclose equality test
+    :param program - module returned by load_program to run the tests in-process, None to run the program as a command
+    :param timings - dictionary to store the run time of each test in, None to not time them
+    :param repeats - number of runs to time, the fastest is kept
     :rpythonturn - Number of identical files found, number of files examined, List of correct files and list of incorrect files
     """
     correct_f=0
@@ -138,15 +254,23 @@ def run_tests(test_names,atol,rtol):
         model_file="./Model_files/%s_model.csv"%(basename)
         compare_log="./User_files/%s_compare.log"%(basename)
         cf_file=EE84.My_open_file(compare_log,"wt")
-        st='python %s %s %s >%s 2>&1'%(sys.argv[1],net_file,output_file,run_log)
+        st,rtn_message,output_text,seconds=run_program(program,net_file,output_file,run_log)
         print("Command is:%s\n"%(st))
-        stc=("Command is:%s\n"%(st))
-        cf_file.write(stc)
-        os_rtn=os.system(st)
-        st="OS returns %r from execution of command\n"%(os_rtn)
-        print(st)
-        cf_file.write(st)
-        op=filecmp.cmp(model_file, output_file)
+        cf_file.write("Command is:%s\n"%(st))
+        print(rtn_message)
+        cf_file.write(rtn_message)
+        if timings is not None:
+            for repeat in range(1,repeats):
+                seconds=min(seconds,run_program(program,net_file,output_file,run_log)[3])
+            timings[basename]=seconds
+            cf_file.write("Run took %.4f s\n"%(seconds))
+        if program is None:
+            op=filecmp.cmp(model_file, output_file)
+        else:
+            file_1=EE84.My_open_file(model_file,"rb")
+            model_bytes=file_1.read()
+            file_1.close()
+            op=(model_bytes==output_text.replace("\n",os.linesep).encode())
         st=("For files %s and %s filecmp returns same=%r\n"%(model_file, output_file, op))
         cf_file.write(st)
         f_examined+=1
@@ -157,27 +281,91 @@ def run_tests(test_names,atol,rtol):
             st=("\t\t\tDetailed testing:\n")
             cf_file.write(st)
             file_1=EE84.My_open_file(model_file,"rt")
-            file_2=EE84.My_open_file(output_file,"rt")
             buff1=file_1.read()
-            buff2=file_2.read()
+            file_1.close()
+            if program is None:
+                file_2=EE84.My_open_file(output_file,"rt")
+                buff2=file_2.read()
+                file_2.close()
+            else:
+                buff2=output_text
             unequal=test_equality(cf_file,buff1,buff2,atol,rtol)
             if unequal:
                 i_list.append(output_file)
             else:
                 correct_f+=1
                 c_list.append(output_file)
-            file_1.close()
-            file_2.close()
         cf_file.close()
     return(correct_f, f_examined, c_list, i_list)
 
 
 
+def option_value(name,default):
+    """ Returns the value of a --name=value option from the command line
+    :param name - name of the option including the --
+    :param default - value returned if the option is not given
+    :return - the value as a string, or default
+    """
+    for arg in sys.argv[4:]:
+        if arg.startswith(name+"="):
+            return(arg[len(name)+1:])
+    return(default)
+
+def check_timings(timings,baseline_name,mode,perf_tol,perf_slack):
+    """ Performance regression gate: compares the run time of each test with the stored baseline timings.
+    A test has regressed when it takes longer than baseline*(1+perf_tol)+perf_slack seconds,
+    the slack stops tiny tests failing on timer noise.
+    :param timings - dictionary of the run time of each test in seconds
+    :param baseline_name - name of the JSON file holding the baseline timings
+    :param mode - "in-process" or "command", timings are only compared with a baseline made the same way
+    :param perf_tol - fraction the run time can increase by, e.g. 0.5 for 50% slower
+    :param perf_slack - extra seconds allowed for every test
+    :return - list of the tests that regressed
+    """
+    regressions=[]
+    if not os.path.exists(baseline_name):
+        print("No baseline timings in %s, use --save-baseline to store these timings"%(baseline_name))
+        return(regressions)
+    base_file=EE84.My_open_file(baseline_name,"rt")
+    baseline=json.load(base_file)
+    base_file.close()
+    if baseline.get("mode")!=mode:
+        print("Baseline timings in %s were made %s, not %s, so they are not compared"%(baseline_name,baseline.get("mode"),mode))
+        return(regressions)
+    print("Performance against %s (tolerance +%g%%, slack %g s):"%(baseline_name,100*perf_tol,perf_slack))
+    for basename,seconds in timings.items():
+        if basename not in baseline["timings"]:
+            print("  %-20s %9.4f s  no baseline"%(basename,seconds))
+            continue
+        base=baseline["timings"][basename]
+        if seconds>base*(1+perf_tol)+perf_slack:
+            regressions.append(basename)
+            verdict="SLOWER (%+.0f%%)"%(100*(seconds/base-1) if base>0 else float("inf"))
+        else:
+            verdict="ok"
+        print("  %-20s %9.4f s  baseline %9.4f s  %s"%(basename,seconds,base,verdict))
+    print("%d tests timed, %d performance regressions"%(len(timings),len(regressions)))
+    print("Performance regressions are:",regressions)
+    return(regressions)
+
+def save_timings(timings,baseline_name,mode):
+    """ Stores the run times of the tests as the new baseline timings
+    :param timings - dictionary of the run time of each test in seconds
+    :param baseline_name - name of the JSON file to write
+    :param mode - "in-process" or "command"
+    """
+    base_file=EE84.My_open_file(baseline_name,"wt")
+    json.dump({"program":sys.argv[1],"mode":mode,"timings":timings},base_file,indent=2)
+    base_file.close()
+    print("Baseline timings saved to %s"%(baseline_name))
+
 def usage():
     print("Command line should be:\npython AutoTest.py MyProg.py Abs_tol Rel_tol\n")
     print("Files need to be in subdirectories of the directory containing Autotest.py and MyProg.py.\nThe input *.net files from the Moodle site should be in a subdirectory called User_files.\nThe output files from MyProg.py will be written to the subdirectory called User_files\n")
     print("Autotest compares the output files in User_files with the model output files in Model_files.")
     print("Autotest will run MyProg.py through all of the a_*, b_*, c_*, d_* and e_* example files from the Moodle site.")
+    print("If MyProg.py can be imported (it provides simulate() and WriteResult()) the tests are run in-process without starting a new Python for each one. Add --subprocess to the end of the command line to always run it as a command.")
+    print("Performance gate: add --timing to time each test and compare it with the baseline timings stored in timing_baseline.json (or --baseline=file.json). A test fails the gate when it is more than --perf-tol=0.5 (50%%) plus --perf-slack=0.005 seconds slower than its baseline, and AutoTest then exits with 1. --perf-repeats=3 keeps the fastest of 3 runs. --save-baseline stores the timings of this run as the new baseline.")
     print("Autotest first uses filecmp to see if the user and model output files are identical.")
     print("If the files are not identical detailed character by character and value by value comparisons are made. The value by value tests are made using numpy.isclose() to see if values are similar enough. This comparison is controlled by the parameters Abs_tol and Rel_tol. The smaller these values the better the agreement needs to be between the model and user output files in order to pass the test. Typically 1.0e-13 is used for both to overcome numeric rounding uncertainty in floating point calculations.")
     print("At the end of the tests a summary is given showing how many files were examined, how many of the files correctly agreed with the model output files and how many were incorrect or different. A summary of the correct and incorrect file names is also printed.")
@@ -197,6 +385,17 @@ if (nargs<4):
 Abs_tol=float(sys.argv[2])
 Rel_tol=float(sys.argv[3])
 print("Tolerances are Abs=%g, Rel=%g"%(Abs_tol,Rel_tol))
+program=None
+if "--subprocess" not in sys.argv:
+    program=load_program(sys.argv[1])
+if program is None:
+    print("Running %s as a command for each test"%(sys.argv[1]))
+else:
+    print("Running %s in-process"%(sys.argv[1]))
+timings=None
+perf_repeats=int(option_value("--perf-repeats",1))
+if ("--timing" in sys.argv) or ("--save-baseline" in sys.argv):
+    timings={}
 correct_files=0
 incorrect_files=0
 files_examined=0
@@ -204,7 +403,7 @@ correct_list=[]
 incorrect_list=[]
 divider_line='*'*80
 a_tests=["a_Test_Circuit_1", "a_Test_Circuit_1C", "a_Test_Circuit_BRX", "a_Test_Circuit_L7", "a_Test_Circuit_Ord"]
-ncorr,nexam,clist,ilist=run_tests(a_tests,Abs_tol,Rel_tol)
+ncorr,nexam,clist,ilist=run_tests(a_tests,Abs_tol,Rel_tol,program,timings,perf_repeats)
 print("%s\nA_test: %d files tested, %d correct, %d incorrect"%(divider_line,nexam, ncorr,(nexam-ncorr)))
 print("Correct files are:",clist)
 print("Incorrect files are:",ilist)
@@ -214,7 +413,7 @@ files_examined+=nexam
 correct_list.append(clist)
 incorrect_list.append(ilist)
 b_tests=["b_CR", "b_RC", "b_Pi_03", "b_Pi_03R", "b_Tee_03", "b_Tee_03R"]
-ncorr,nexam,clist,ilist=run_tests(b_tests,Abs_tol,Rel_tol)
+ncorr,nexam,clist,ilist=run_tests(b_tests,Abs_tol,Rel_tol,program,timings,perf_repeats)
 print("%s\nB_test: %d files tested, %d correct, %d incorrect"%(divider_line,nexam, ncorr,(nexam-ncorr)))
 print("Correct files are:",clist)
 print("Incorrect files are:",ilist)
@@ -224,7 +423,7 @@ files_examined+=nexam
 correct_list.append(clist)
 incorrect_list.append(ilist)
 c_tests=["c_LCR", "c_LCG"]
-ncorr,nexam,clist,ilist=run_tests(c_tests,Abs_tol,Rel_tol)
+ncorr,nexam,clist,ilist=run_tests(c_tests,Abs_tol,Rel_tol,program,timings,perf_repeats)
 print("%s\nC_test: %d files tested, %d correct, %d incorrect"%(divider_line,nexam, ncorr,(nexam-ncorr)))
 print("Correct files are:",clist)
 print("Incorrect files are:",ilist)
@@ -234,7 +433,7 @@ files_examined+=nexam
 correct_list.append(clist)
 incorrect_list.append(ilist)
 d_tests=["d_LPF_B50", "d_LPF_B75", "d_LPF_B750", "d_LPF_Bess350", "d_LPF_C550"]
-ncorr,nexam,clist,ilist=run_tests(d_tests,Abs_tol,Rel_tol)
+ncorr,nexam,clist,ilist=run_tests(d_tests,Abs_tol,Rel_tol,program,timings,perf_repeats)
 print("%s\nD_test: %d files tested, %d correct, %d incorrect"%(divider_line,nexam, ncorr,(nexam-ncorr)))
 print("Correct files are:",clist)
 print("Incorrect files are:",ilist)
@@ -244,7 +443,7 @@ files_examined+=nexam
 correct_list.append(clist)
 incorrect_list.append(ilist)
 e_tests=["e_Ladder_100", "e_Ladder_400"]
-ncorr,nexam,clist,ilist=run_tests(e_tests,Abs_tol,Rel_tol)
+ncorr,nexam,clist,ilist=run_tests(e_tests,Abs_tol,Rel_tol,program,timings,perf_repeats)
 print("%s\nE_test: %d files tested, %d correct, %d incorrect"%(divider_line,nexam, ncorr,(nexam-ncorr)))
 print("Correct files are:",clist)
 print("Incorrect files are:",ilist)
@@ -260,3 +459,13 @@ print("\n%s\n\t\tTotals\n%d files tested, %d correct, %d incorrect"%(divider_lin
 print("Correct files are:",correct_list)
 print("Incorrect files are:",incorrect_list)
 print(divider_line)
+
+if timings is not None:
+    mode="command" if program is None else "in-process"
+    baseline_name=option_value("--baseline","./timing_baseline.json")
+    regressions=check_timings(timings,baseline_name,mode,float(option_value("--perf-tol",0.5)),float(option_value("--perf-slack",0.005)))
+    if "--save-baseline" in sys.argv:
+        save_timings(timings,baseline_name,mode)
+    print(divider_line)
+    if regressions:
+        sys.exit(1)
@@ -0,0 +1,185 @@
+#Scaling benchmark: generates netlists of a chosen size and times each phase of the
+# simulator on them separately - reading the file, InputRead, NodeSorter, getting the
+# circuit ready for the sweep, the sweep itself and formatting the output.
+# The results are printed as a table and saved as JSON so runs can be compared.
+#
+# Usage: python Benchmark.py [options]
+#   --kinds=ladder,pi,tee,mixed   the circuits to generate
+#   --components=10,100,1000      number of components (up to 100k)
+#   --frequencies=100,10000       number of frequencies (up to 1M)
+#   --repeats=3                   runs of each netlist, the fastest is kept
+#   --output=benchmark.json       where to save the results
+#   --keep=folder                 also save the generated netlists in this folder
+# Any other "--" option (--tree, --scalar, --workers=2 ...) is passed on to the planner.
+
+import sys
+import os
+import time
+import json
+import random
+import platform
+import tempfile
+import numpy as np
+import Main
+
+Kinds = ["ladder", "pi", "tee", "mixed"]
+
+
+def Component(n1, n2, kind, value):
+    return "n1=%d n2=%d %s=%.3e" % (n1, n2, kind, value)
+
+def GenerateNetlist(kind, Ncomponents, Nfreqs, seed=0):
+    # Function : GenerateNetlist
+    # Builds the text of a netlist with about Ncomponents components.
+    #   ladder : series inductors and shunt capacitors, like e_Ladder_100 and e_Ladder_400
+    #   pi     : Pi sections of resistors (shunt, series, shunt) joined in a chain
+    #   tee    : Tee sections of resistors (series, shunt, series) joined in a chain
+    #   mixed  : a ladder with a random R, L, C or G in every position
+    # Inputs: [kind : String], [Ncomponents : Integer], [Nfreqs : Integer], [seed : Integer]
+    # Output: [netlist : String]
+    generator = random.Random(seed)
+    lines = ["<CIRCUIT>"]
+    node = 1
+    while len(lines) <= Ncomponents:
+        if kind == "ladder":
+            lines.append(Component(node, node+1, "L", 1e-4))
+            lines.append(Component(node+1, 0, "C", 1e-9))
+            node += 1
+        elif kind == "pi":
+            lines.append(Component(node, 0, "R", 75))
+            lines.append(Component(node, node+1, "R", 220))
+            lines.append(Component(node+1, 0, "R", 150))
+            node += 1
+        elif kind == "tee":
+            lines.append(Component(node, node+1, "R", 220))
+            lines.append(Component(node+1, 0, "R", 150))
+            lines.append(Component(node+1, node+2, "R", 220))
+            node += 2
+        else:
+            for n1, n2 in [(node, node+1), (node+1, 0)]:
+                value = generator.choice(["R", "L", "C", "G"])
+                scale = {"R": 100, "L": 1e-4, "C": 1e-9, "G": 0.01}[value]
+                lines.append(Component(n1, n2, value, scale*generator.uniform(0.5, 2)))
+            node += 1
+    lines += ["</CIRCUIT>", "", "<TERMS>", "VT=5 RS=50", "RL=75",
+              "Fstart=10.0 Fend=10e+6 Nfreqs=%d" % Nfreqs, "</TERMS>", "", "<OUTPUT>"]
+    lines += ["Vin V", "Vout V", "Iin A", "Iout A", "Pin W", "Zout Ohms", "Pout W", "Zin Ohms", "Av", "Ai"]
+    lines.append("</OUTPUT>")
+    return "\n".join(lines)+"\n"
+
+def TimePhases(inputName, Options=[]):
+    # Function : TimePhases
+    # Runs the simulator on a netlist file one phase at a time, timing each phase.
+    # Inputs: [inputName : String], [Options : String List] - passed on to the planner
+    # Output: [error : boolean], [Phases : Dictionary] - seconds for each phase,
+    #   [Plan : Dictionary] - the plan used for the sweep
+    Phases = {}
+    start = time.perf_counter()
+
+    FileLines = []
+    filee = open(inputName, "r")
+    for linex in filee:
+        FileLines.append(linex.replace("\n", ""))
+    filee.close()
+    Phases["read"] = time.perf_counter()-start
+
+    start = time.perf_counter()
+    error, unsortedCircuit, Source, Sourcetype, RSval, RLval, Frequencies, OutputOrder = Main.InputRead(FileLines)
+    Phases["parse"] = time.perf_counter()-start
+    if error:
+        return True, Phases, {}
+
+    start = time.perf_counter()
+    error, sortedCircuit = Main.NodeSorter(unsortedCircuit)
+    Phases["sort"] = time.perf_counter()-start
+    if error:
+        return True, Phases, {}
+
+    start = time.perf_counter()
+    sortedCircuit = Main.FoldConstant(sortedCircuit)
+    Netlist = {"Circuit": Main.circuitTable(sortedCircuit),
+               "Source": Source, "Sourcetype": Sourcetype, "RSval": RSval, "RLval": RLval,
+               "Frequencies": Frequencies, "OutputOrder": OutputOrder}
+    Plan = Main.NetlistPlan(Netlist, False, Options)
+    Phases["prepare"] = time.perf_counter()-start
+
+    start = time.perf_counter()
+    error, Result = Main.SimulateNetlist(Netlist, False, 0, Plan)
+    Phases["sweep"] = time.perf_counter()-start
+    if error:
+        return True, Phases, Plan
+
+    start = time.perf_counter()
+    outputfile = open(os.devnull, "w")
+    Main.WriteResult(outputfile, Result)
+    outputfile.close()
+    Phases["output"] = time.perf_counter()-start
+    return False, Phases, Plan
+
+def ListOption(Options, name, default):
+    return [value for value in Main.OptionValue(Options, name, default).split(",") if value != ""]
+
+
+if __name__ == '__main__':
+    Options = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    kinds = ListOption(Options, "--kinds", ",".join(Kinds))
+    sizes = [int(value) for value in ListOption(Options, "--components", "10,100,1000")]
+    freqs = [int(value) for value in ListOption(Options, "--frequencies", "100,10000")]
+    repeats = int(Main.OptionValue(Options, "--repeats", 3))
+    outputName = Main.OptionValue(Options, "--output", "benchmark.json")
+    folder = Main.OptionValue(Options, "--keep", None)
+    if folder is None:
+        folder = tempfile.mkdtemp()
+    else:
+        os.makedirs(folder, exist_ok=True)
+    #Long ladders attenuate so much that some values overflow, which is expected here
+    np.seterr(all="ignore")
+    Own = ["--kinds", "--components", "--frequencies", "--repeats", "--output", "--keep"]
+    PlanOptions = [option for option in Options if option.split("=")[0] not in Own]
+
+    Report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "cpus": os.cpu_count(),
+        "options": PlanOptions,
+        "repeats": repeats,
+        "results": []
+    }
+    Columns = ["read", "parse", "sort", "prepare", "sweep", "output"]
+    print("%-7s %10s %10s %-6s" % ("kind", "components", "freqs", "engine")+"".join("%10s" % name for name in Columns)+"%10s" % "total")
+    for kind in kinds:
+        for Ncomponents in sizes:
+            for Nfreqs in freqs:
+                inputName = os.path.join(folder, "%s_%d_%d.net" % (kind, Ncomponents, Nfreqs))
+                netfile = open(inputName, "w")
+                netfile.write(GenerateNetlist(kind, Ncomponents, Nfreqs))
+                netfile.close()
+
+                Best = None
+                for _ in range(repeats):
+                    error, Phases, Plan = TimePhases(inputName, PlanOptions)
+                    if error:
+                        break
+                    if Best is None:
+                        Best = Phases
+                    Best = {name: min(Best[name], Phases[name]) for name in Phases}
+                if error:
+                    print("%-7s %10d %10d  failed" % (kind, Ncomponents, Nfreqs))
+                    continue
+                total = sum(Best.values())
+                print("%-7s %10d %10d %-6s" % (kind, Ncomponents, Nfreqs, Plan["engine"])
+                      +"".join("%10.4f" % Best[name] for name in Columns)+"%10.4f" % total)
+                Report["results"].append({
+                    "kind": kind,
+                    "components": Ncomponents,
+                    "frequencies": Nfreqs,
+                    "engine": Plan["engine"],
+                    "phases": Best,
+                    "total": total
+                })
+
+    resultfile = open(outputName, "w")
+    json.dump(Report, resultfile, indent=2)
+    resultfile.close()
+    print("Results saved to %s" % outputName)
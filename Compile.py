@@ -0,0 +1,35 @@
+#Compiles a netlist into the binary .cnet form, which Main.py loads straight from
+# disk (memory mapped) instead of reading and sorting the text on every run:
+#   python Compile.py input.net [output.cnet]
+#   python Main.py output.cnet results.csv
+# and turns a compiled netlist back into text:
+#   python Compile.py --decompile input.cnet [output.net]
+# written to input_decompiled.net unless another name is given, so the netlist it was
+# compiled from isnt overwritten.
+
+import sys
+import os
+from Main import CompileNetlist, DecompileNetlist
+
+if __name__ == '__main__':
+    Arguments = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(Arguments) == 0:
+        print("No Input File")
+        sys.exit(1)
+    inputName = Arguments[0]
+
+    if "--decompile" in sys.argv:
+        outputName = Arguments[1] if len(Arguments) > 1 else os.path.splitext(inputName)[0]+"_decompiled.net"
+        error, netlist = DecompileNetlist(inputName)
+        if not error:
+            netfile = open(outputName, "w")
+            netfile.write(netlist)
+            netfile.close()
+    else:
+        outputName = Arguments[1] if len(Arguments) > 1 else os.path.splitext(inputName)[0]+".cnet"
+        error = CompileNetlist(inputName, outputName)
+
+    if error:
+        print("Invalid netlist: %s" % inputName)
+        sys.exit(1)
+    print("%s -> %s" % (inputName, outputName))
@@ -1,18 +1,34 @@
 import math
+import re
 import numpy as np
 import copy
 import sys
+import os
+import time
 
  
-#To use my testing function, type "python Circuit.py Test" into the command line
+#To use my testing function, type "python Main.py Test" into the command line,
+# the tests themselves are in Testing.py
 
 
+#ABCD matrix of a block that hasnt had a frequency applied yet. Shared between all
+# components, so it is read only - applyFreq creates a new matrix for each component.
+Identity = np.array([[1, 0j], [0j, 1]])
+Identity.flags.writeable = False
+
+#Names of all the outputs that can be requested in the <OUTPUT> block.
+OutputNames = ["Vin", "Vout", "Iin", "Iout", "Pin", "Pout", "Zin", "Zout", "Av", "Ai"]
+
 
 class circuitBlock:
     # circuitBlock - type: Class
     # Description: Each object represents a component defined in the input.
     # These objects have many functionalities and can perform the necessary
     # actions for circuit analysis.
+    # The attributes are fixed with __slots__ so each object is kept small,
+    # the A, B, C and D values are read straight out of the ABCD matrix.
+
+    __slots__ = ("n1", "n2", "matrix", "type", "series", "val", "oneover", "freqdependant", "fixed", "tol")
 
     def __init__(self, node1, node2, component, value):
 
@@ -35,16 +51,14 @@ class circuitBlock:
             self.n2 = node1
 
         #Storing and initialising all values.
-        self.matrix = np.array([[1, 0j], [0j, 1]])
+        self.matrix = Identity
         self.type = component.upper()
         self.series = True
         self.val = value
         self.oneover = False
         self.freqdependant = False
-        self.a = self.matrix[0, 0]
-        self.b = self.matrix[0, 1]
-        self.c = self.matrix[1, 0]
-        self.d = self.matrix[1, 1]
+        self.fixed = False
+        self.tol = None
 
         # Processing the inputs to interpret them into meaningful data
         if self.type in ["G", "C"]:
@@ -56,6 +70,24 @@ class circuitBlock:
         elif abs(self.n1-self.n2) == 1:
             self.series = True
 
+    # A, B, C and D of the ABCD matrix. These also work when the matrix holds
+    # a stack of matrices (one per frequency), giving an array of values.
+    @property
+    def a(self):
+        return self.matrix[..., 0, 0][()]
+
+    @property
+    def b(self):
+        return self.matrix[..., 0, 1][()]
+
+    @property
+    def c(self):
+        return self.matrix[..., 1, 0][()]
+
+    @property
+    def d(self):
+        return self.matrix[..., 1, 1][()]
+
 
     def applyFreq(self, frequency=0):
 
@@ -71,6 +103,10 @@ class circuitBlock:
 
         # Outputs: null
 
+        # Folded blocks already hold thier constant ABCD matrix.
+        if self.fixed:
+            return
+
         # Creats the omega constant for frequency dependant components.
         omega = 2j*math.pi*frequency
         z = self.val
@@ -81,14 +117,11 @@ class circuitBlock:
             z = z*omega
         if self.oneover:
             z = 1/z
+        self.matrix = np.array([[1, 0j], [0j, 1]])
         if self.series:
             self.matrix[0, 1] = z
         else:
             self.matrix[1, 0] = 1/z
-        self.a = self.matrix[0, 0]
-        self.b = self.matrix[0, 1]
-        self.c = self.matrix[1, 0]
-        self.d = self.matrix[1, 1]
 
     def multM(self, multiplierObject):
 
@@ -102,14 +135,10 @@ class circuitBlock:
         # Output: null
 
         #Performs a matrix multiplication and stors it in its own ABCD matrix
-        # it also redifned A,B,C,D and the nodal start and end connections.
+        # it also redifnes the nodal start and end connections.
 
         self.matrix = np.matmul(self.matrix, multiplierObject.matrix)
         self.n2 = multiplierObject.n2
-        self.a = self.matrix[0, 0]
-        self.b = self.matrix[0, 1]
-        self.c = self.matrix[1, 0]
-        self.d = self.matrix[1, 1]
 
     def VAPIn(self, Rs, Rl, Source, SourceType):
         # Method: VAPIn
@@ -211,6 +240,106 @@ class circuitBlock:
         return AllValues
 
 
+class circuitTable:
+    # circuitTable - type: Class
+    # Description: Compact struct of arrays form of a sorted circuit. Rather than one
+    # object per component, each property of the components is stored in its own array
+    # (one entry per component, in circuit order). The batched sweep works directly
+    # from these arrays, building the ABCD matrices of many components at once.
+
+    __slots__ = ("n1", "n2", "value", "series", "oneover", "freqdependant", "fixed", "constant")
+
+    def __init__(self, sortedCircuit):
+
+        # Instantiation method: Copies the node connections, values and flags of each
+        # circuitBlock into the arrays. Folded blocks keep thier constant ABCD matrix,
+        # stored in order of the fixed components.
+
+        # Inputs: [sortedCircuit : circuitBlock List]
+
+        # Outputs: null
+
+        self.n1 = np.array([component.n1 for component in sortedCircuit], dtype=np.int64)
+        self.n2 = np.array([component.n2 for component in sortedCircuit], dtype=np.int64)
+        self.value = np.array([component.val for component in sortedCircuit], dtype=float)
+        self.series = np.array([component.series for component in sortedCircuit], dtype=bool)
+        self.oneover = np.array([component.oneover for component in sortedCircuit], dtype=bool)
+        self.freqdependant = np.array([component.freqdependant for component in sortedCircuit], dtype=bool)
+        self.fixed = np.array([component.fixed for component in sortedCircuit], dtype=bool)
+        self.constant = np.array([component.matrix for component in sortedCircuit if component.fixed],
+                                 dtype=complex).reshape(-1, 2, 2)
+
+    @classmethod
+    def fromArrays(cls, Arrays):
+        # Method: fromArrays
+        # Builds a table straight from its arrays (for example memory mapped from a
+        # compiled netlist) without any circuitBlock objects.
+        # Inputs: [Arrays : Dictionary of arrays] - one for each attribute
+        # Outputs: [circuitTable]
+        table = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(table, name, Arrays[name])
+        return table
+
+    def blocks(self):
+        # Method: blocks
+        # Turns the table back into circuitBlock objects, for the scalar engine.
+        # Folded blocks get thier constant matrix back.
+        # Outputs: [sortedCircuit : circuitBlock List]
+        Types = {(False, False): "R", (True, False): "G", (False, True): "L", (True, True): "C"}
+        sortedCircuit = []
+        constant = iter(self.constant)
+        for n1, n2, value, series, oneover, freqdependant, fixed in zip(
+                self.n1.tolist(), self.n2.tolist(), self.value.tolist(), self.series.tolist(),
+                self.oneover.tolist(), self.freqdependant.tolist(), self.fixed.tolist()):
+            block = circuitBlock(n1, n2, Types[(oneover, freqdependant)], value)
+            block.series = series
+            if fixed:
+                block.matrix = np.array(next(constant))
+                block.fixed = True
+            sortedCircuit.append(block)
+        return sortedCircuit
+
+    def __len__(self):
+        return len(self.value)
+
+    def sweepMatrices(self, Frequencies, start=0, stop=None):
+
+        # Method: sweepMatrices
+        # Builds the ABCD matrices of the components from start to stop at every
+        # frequency in one go. This uses the same operations as circuitBlock.applyFreq
+        # so the values match the scalar path.
+
+        # Inputs: [Frequencies : float array], [start : Integer], [stop : Integer]
+
+        # Outputs: [matrices : complex array (Ncomponents x Nfreqs x 2 x 2)]
+
+        rows = slice(start, stop)
+        series = self.series[rows]
+        oneover = self.oneover[rows]
+        freqdependant = self.freqdependant[rows]
+        fixed = self.fixed[rows]
+
+        matrices = np.zeros((len(series), len(Frequencies), 2, 2), dtype=complex)
+        matrices[:, :, 0, 0] = 1
+        matrices[:, :, 1, 1] = 1
+
+        z = np.empty((len(series), len(Frequencies)), dtype=complex)
+        z[:] = self.value[rows, None]
+        z[freqdependant] *= 2j*math.pi*np.asarray(Frequencies)
+        z[oneover] = 1/z[oneover]
+        z[~series] = 1/z[~series]
+        matrices[series, :, 0, 1] = z[series]
+        matrices[~series, :, 1, 0] = z[~series]
+
+        # Folded blocks use thier stored matrix at every frequency.
+        if fixed.any():
+            firstFixed = np.count_nonzero(self.fixed[:start])
+            constant = self.constant[firstFixed:firstFixed+np.count_nonzero(fixed)]
+            matrices[fixed] = constant[:, None]
+        return matrices
+
+
 def NodeSorter(unsortedCircuit):
     # Function : NodeSorter
     # Since all nodes can be defined in any order, it is important that we sort them
@@ -223,7 +352,7 @@ def NodeSorter(unsortedCircuit):
 
     # Sorts the circuit with the n1 key as the parameter to define the order.
     sortedCircuit = sorted(unsortedCircuit, key=lambda block: (block.n1 , block.n2))
-    allSeries = []
+    allSeries = set()
     order = 0
     #Validation checks
     for component in sortedCircuit:  # checks duplicates not parallel, checks valid node number not negative and no node skips, no same node connection
@@ -236,23 +365,532 @@ def NodeSorter(unsortedCircuit):
         else:
             order = component.n1
         if component.n2 != 0:  # if its not parallel
-            if [component.n1, component.n2] in allSeries:  # and if the series already exists
+            if (component.n1, component.n2) in allSeries:  # and if the series already exists
                 return True, sortedCircuit
-            allSeries.append([component.n1, component.n2])
+            allSeries.add((component.n1, component.n2))
     # no problems return true and the sorted array.
     return False, sortedCircuit
 
-def InputRead(FileLines):
+def FoldConstant(sortedCircuit):
+    # Function : FoldConstant
+    # Only capacitors and inductors change with frequency, so any run of consecutive
+    # resistors and conductances multiplies out to the same ABCD matrix at every frequency.
+    # This pass multiplies each of these runs together once and replaces them with a
+    # single fixed block, so the sweep doesnt redo the work at every frequency.
+    # A purely resistive circuit folds down to one block.
+    # Multiplying a run out first changes the order of the products, so values that
+    # should be zero can come out as different round-off (Im(Pout) of a_Test_Circuit_1C
+    # at 1.111e+06 Hz goes from 4.944e-22 to 5.177e-22, next to a Re(Pout) of 2.043e-05).
+
+    # Inputs: [sortedCircuit : circuitBlock List]
+
+    # Output: [foldedCircuit : circuitBlock List]
+
+    foldedCircuit = []
+    for component in sortedCircuit:
+        if component.freqdependant:
+            foldedCircuit.append(component)
+        elif foldedCircuit and foldedCircuit[-1].fixed:
+            # Extends the current run of frequency independent blocks.
+            component.applyFreq()
+            foldedCircuit[-1].multM(component)
+        else:
+            # Starts a new run, copied so the circuit definition isnt overwritten.
+            FixedNode = copy.deepcopy(component)
+            FixedNode.applyFreq()
+            FixedNode.fixed = True
+            foldedCircuit.append(FixedNode)
+    return foldedCircuit
+
+def ScalarSweep(sortedCircuit, Frequencies, RSval, RLval, Source, Sourcetype, Names=OutputNames):
+    # Function : ScalarSweep
+    # The original frequency loop. Each frequency is applied to every component
+    # in turn and the ABCD matrices are multiplied together one 2x2 product at a time.
+    # Kept as the reference implementation for the batched engine. The outputs are
+    # then calculated for all frequencies at once like the batched engines, so only
+    # the ones asked for are worked out.
+
+    # Inputs: [sortedCircuit : circuitBlock List], [Frequencies : float array], [RSval : float],
+    #   [RLval : float], [Source : float], [Sourcetype : Integer],
+    #   [Names : String List] - the outputs to calculate, all of them by default
+
+    # Output: [FrequencyMasterMatrix : Dictionary of complex arrays]
+
+    FrequencyMasterMatrix = []
+    for FrequencyX in Frequencies:
+        # Applies the frequencies to the circuit by individually
+        # updating each component with thier frequency and keeping the
+        # overall matrix. applyFreq and multM replace the matrix
+        # rather than changing it so a shallow copy of the first block is enough.
+        FirstNode = copy.copy(sortedCircuit[0])
+        FirstNode.applyFreq(FrequencyX)
+        for indexx in range(1, len(sortedCircuit)):
+            sortedCircuit[indexx].applyFreq(FrequencyX)
+            FirstNode.multM(sortedCircuit[indexx])
+        FrequencyMasterMatrix.append(FirstNode.matrix)
+    matrix = np.array(FrequencyMasterMatrix, dtype=complex).reshape(-1, 2, 2)
+    return CalculateColumns(matrix[:, 0, 0], matrix[:, 0, 1], matrix[:, 1, 0], matrix[:, 1, 1],
+                            RSval, RLval, Source, Sourcetype, Names)
+
+#Number of component matrices built at a time by CascadeChain (about 32MB of ABCD matrices).
+ChainBlockSize = 2**19
+
+#Number of frequencies calculated and written at a time in streaming mode.
+StreamChunkSize = 65536
+
+#Memory the planner aims to stay under (in MB) unless --memory-limit is given.
+MemoryLimitMB = 1024
+
+#Amount of work (ABCD products) above which the planner splits the sweep between threads.
+ParallelWork = 4000000
+
+#Number of samples times frequencies swept at a time in the monte carlo analysis
+# (each output is about 16MB for each of these chunks).
+MonteCarloPoints = 2**20
+
+def CascadeChain(Circuit, Frequencies):
+    # Function : CascadeChain
+    # Multiplies the components together left to right, one batched
+    # (Nfreqs x 2 x 2) product per component. The component matrices are
+    # built a block of components at a time to keep the memory bounded.
+
+    # Inputs: [Circuit : circuitTable], [Frequencies : float array]
+
+    # Output: [matrix : complex array (Nfreqs x 2 x 2)]
+
+    blockSize = max(1, ChainBlockSize//max(1, len(Frequencies)))
+    matrix = None
+    for start in range(0, len(Circuit), blockSize):
+        for componentMatrix in Circuit.sweepMatrices(Frequencies, start, start+blockSize):
+            if matrix is None:
+                matrix = componentMatrix
+            else:
+                matrix = np.matmul(matrix, componentMatrix)
+    return matrix
+
+def CascadeTree(Circuit, Frequencies):
+    # Function : CascadeTree
+    # Since matrix products are associative the chain does not have to be multiplied
+    # strictly left to right. All of the component matrices are stacked over both the
+    # component and frequency axes and neighbouring pairs are combined in one batched
+    # product per level, so N components are reduced in log2(N) steps.
+    # The rounding differs slightly from CascadeChain as the products are grouped differently.
+
+    # Inputs: [Circuit : circuitTable], [Frequencies : float array]
+
+    # Output: [matrix : complex array (Nfreqs x 2 x 2)]
+
+    return TreeReduce(Circuit.sweepMatrices(Frequencies))
+
+def TreeReduce(matrices):
+    # Function : TreeReduce
+    # Reduces a stack of ABCD matrices to their ordered product by multiplying
+    # neighbouring pairs together until only one is left. If there is an odd
+    # number at any level the last matrix is carried up to the next level.
+
+    # Inputs: [matrices : complex array (N x ... x 2 x 2)]
+
+    # Output: [matrix : complex array (... x 2 x 2)]
+
+    while len(matrices) > 1:
+        paired = np.matmul(matrices[0:-1:2], matrices[1::2])
+        if len(matrices) % 2 == 1:
+            paired = np.concatenate((paired, matrices[-1:]))
+        matrices = paired
+    return matrices[0]
+
+
+class outputColumns:
+    # outputColumns - type: Class
+    # Description: Batched version of the output methods of circuitBlock. Holds the
+    # A, B, C and D values of the overall circuit at every frequency and works out an
+    # output for all frequencies at once, but only when it is asked for. Every output
+    # is kept once calculated, so outputs that depend on each other share the work
+    # (Vin, Iin and Pin need Zin, Vout, Iout and Pout need Vin, Iin, Av and Ai).
+    # The equations are the same as Zin, Zout, VAPIn, AvAi and VAPout.
+
+    __slots__ = ("A", "B", "C", "D", "Rs", "Rl", "Source", "SourceType", "values")
+
+    def __init__(self, A, B, C, D, Rs, Rl, Source, SourceType):
+
+        # Inputs: [A : complex array], [B : complex array], [C : complex array], [D : complex array],
+        #   [Rs : float], [Rl : float], [Source : float], [SourceType: Integer]
+
+        # Outputs: null
+
+        self.A = A
+        self.B = B
+        self.C = C
+        self.D = D
+        self.Rs = Rs
+        self.Rl = Rl
+        self.Source = Source
+        self.SourceType = SourceType
+        self.values = {}
+
+    def __getitem__(self, name):
+        # Returns the named output, calculating it first if it hasnt been already.
+        if name not in self.values:
+            self.values[name] = getattr(self, "calc"+name)()
+        return self.values[name]
+
+    def calcZin(self):
+        return (self.A*self.Rl + self.B) / (self.C*self.Rl + self.D)
+
+    def calcZout(self):
+        return (self.D*self.Rs + self.B) / (self.C*self.Rs + self.A)
+
+    def calcVin(self):
+        Zinp = self["Zin"]
+        if self.SourceType == 1:             #Represents a voltage source.
+            return (Zinp/(Zinp+self.Rs))*self.Source
+        elif self.SourceType == 2:           #Represents a current source.
+            return self.Source/((1/self.Rs)+(1/Zinp))
+
+    def calcIin(self):
+        return self["Vin"]/self["Zin"]
+
+    def calcPin(self):
+        return self["Vin"]*np.conjugate(self["Iin"])
+
+    def calcAv(self):
+        return self.Rl/(self.A*self.Rl+self.B)
+
+    def calcAi(self):
+        return 1/(self.C*self.Rl+self.D)
+
+    def calcVout(self):
+        return self["Vin"]*self["Av"]
+
+    def calcIout(self):
+        return self["Iin"]*self["Ai"]
+
+    def calcPout(self):
+        return self["Vout"]*np.conjugate(self["Iout"])
+
+def Sweep(sortedCircuit, Circuit, Frequencies, RSval, RLval, Source, Sourcetype, Names, Engine="chain"):
+    # Function : Sweep
+    # Runs the frequency sweep with the chosen engine, so the rest of the program
+    # doesnt need to know which one is being used.
+
+    # Inputs: [sortedCircuit : circuitBlock List], [Circuit : circuitTable], [Frequencies : float array],
+    #   [RSval : float], [RLval : float], [Source : float], [Sourcetype : Integer],
+    #   [Names : String List] - the outputs to calculate,
+    #   [Engine : String] - "scalar", "chain" (batched) or "tree" (batched pairwise)
+
+    # Output: [FrequencyMasterMatrix : Dictionary of complex arrays]
+
+    if Engine == "scalar":
+        return ScalarSweep(sortedCircuit, Frequencies, RSval, RLval, Source, Sourcetype, Names)
+    return BatchedSweep(Circuit, Frequencies, RSval, RLval, Source, Sourcetype, Engine, Names)
+
+def PlanExecution(Ncomponents, Nfreqs, Noutputs, Fourier=False, Options=[], Nterminations=1):
+    # Function : PlanExecution
+    # Decides how the sweep should be run from the size of the problem. The engine,
+    # the number of frequencies done at a time, whether to stream the output and the
+    # number of threads are chosen from estimates of the work and the memory needed.
+    # Any of these can be forced with --scalar, --chain, --tree, --stream, --chunk=N,
+    # --workers=N and --memory-limit=MB.
+    # The estimates are rough figures measured from the program, in bytes per frequency
+    # point: the cascade uses about 192 (a running product and a temporary), the tree
+    # engine 128 per component (the stack and the pairs), and the outputs with thier
+    # formatted text about 413 plus 103 for each requested output, for every
+    # combination of terminations in a termination sweep.
+
+    # Inputs: [Ncomponents : Integer], [Nfreqs : Integer], [Noutputs : Integer],
+    #   [Fourier : boolean] - a fourier transform needs every frequency before writing,
+    #   [Options : String List], [Nterminations : Integer] - combinations of terminations
+
+    # Output: [Plan : Dictionary]
+
+    Plan = {
+        "components": Ncomponents,
+        "frequencies": Nfreqs,
+        "outputs": Noutputs,
+        "terminations": Nterminations,
+        "work": Ncomponents*Nfreqs
+    }
+
+    #Engine: the scalar loop is only quicker when there are hardly any frequencies,
+    # the tree only helps long circuits where each batched product is small.
+    if "--scalar" in Options:
+        Plan["engine"] = "scalar"
+    elif "--tree" in Options:
+        Plan["engine"] = "tree"
+    elif "--chain" in Options:
+        Plan["engine"] = "chain"
+    elif Nfreqs <= 2 and Ncomponents <= 16:
+        Plan["engine"] = "scalar"
+    elif Ncomponents >= 1024 and Nfreqs <= 64:
+        Plan["engine"] = "tree"
+    else:
+        Plan["engine"] = "chain"
+
+    try:
+        limit = float(OptionValue(Options, "--memory-limit", MemoryLimitMB))*2**20
+    except ValueError:
+        limit = MemoryLimitMB*2**20
+    sweepBytes = 192
+    if Plan["engine"] == "tree":
+        sweepBytes = 128*Ncomponents
+    outputBytes = (413 + 103*Noutputs)*Nterminations
+
+    #Streaming: used when asked for, or when the whole output wont fit in the memory limit.
+    Plan["stream"] = not Fourier and ("--stream" in Options or (sweepBytes+outputBytes)*Nfreqs > limit)
+
+    #Chunk size: streaming keeps a chunk of formatted output in memory, otherwise
+    # only the sweep itself is split up if it is too big.
+    if Plan["stream"]:
+        chunk = min(StreamChunkSize, int(limit//(sweepBytes+outputBytes)))
+    else:
+        chunk = min(Nfreqs, int(limit//sweepBytes))
+    try:
+        chunk = int(OptionValue(Options, "--chunk", chunk))
+    except ValueError:
+        pass
+
+    #Threads: numpy releases the GIL during the batched products, so large sweeps are
+    # split between threads. The scalar loop changes the components so always runs alone.
+    try:
+        workers = int(OptionValue(Options, "--workers", 0))
+    except ValueError:
+        workers = 0
+    if workers <= 0:
+        workers = 1
+        if Plan["work"] >= ParallelWork:
+            workers = min(os.cpu_count() or 1, 8)
+    if Plan["engine"] == "scalar":
+        workers = 1
+    if workers > 1 and not Plan["stream"]:
+        chunk = min(chunk, -(-Nfreqs//workers))
+    Plan["chunk"] = max(1, min(chunk, max(1, Nfreqs)))
+    Plan["chunks"] = -(-Nfreqs//Plan["chunk"])
+    Plan["workers"] = max(1, min(workers, Plan["chunks"]))
+
+    #Estimated peak memory of the sweep and the output. The chain engine also builds
+    # up to ChainBlockSize component matrices at a time in each worker.
+    blockBytes = 0
+    if Plan["engine"] == "chain":
+        blockBytes = 64*min(Ncomponents*Plan["chunk"], ChainBlockSize)*Plan["workers"]
+    if Plan["stream"]:
+        Plan["memory"] = blockBytes + (sweepBytes+outputBytes)*Plan["chunk"]*(Plan["workers"]+1)
+    else:
+        Plan["memory"] = blockBytes + sweepBytes*Plan["chunk"]*Plan["workers"] + outputBytes*Nfreqs
+    return Plan
+
+def PrintPlan(Plan):
+    # Function : PrintPlan
+    # Prints the execution plan for --dry-run.
+
+    # Inputs: [Plan : Dictionary]
+
+    # Output: null
+
+    if Plan["engine"] == "montecarlo":
+        print("Execution plan:")
+        print("  components       : %d"%(Plan["components"]))
+        print("  frequencies      : %d"%(Plan["frequencies"]))
+        print("  outputs          : %d"%(Plan["outputs"]))
+        print("  samples          : %d (%d percentiles kept)"%(Plan["samples"], Plan["percentiles"]))
+        print("  work             : %d ABCD products"%(Plan["work"]))
+        print("  engine           : montecarlo")
+        print("  chunk size       : %d frequencies (%d chunks)"%(Plan["chunk"], Plan["chunks"]))
+        print("  output           : written at the end")
+        print("  execution        : serial")
+        print("  estimated memory : %.1f MB"%(Plan["memory"]/2**20))
+        return
+
+    execution = "serial"
+    if Plan["workers"] > 1:
+        execution = "parallel (%d threads)"%(Plan["workers"])
+    print("Execution plan:")
+    print("  components       : %d"%(Plan["components"]))
+    print("  frequencies      : %d"%(Plan["frequencies"]))
+    print("  outputs          : %d"%(Plan["outputs"]))
+    if Plan["terminations"] > 1:
+        print("  terminations     : %d combinations"%(Plan["terminations"]))
+    print("  work             : %d ABCD products"%(Plan["work"]))
+    print("  engine           : %s"%(Plan["engine"]))
+    print("  chunk size       : %d frequencies (%d chunks)"%(Plan["chunk"], Plan["chunks"]))
+    print("  output           : %s"%("streamed" if Plan["stream"] else "written at the end"))
+    print("  execution        : %s"%(execution))
+    print("  estimated memory : %.1f MB"%(Plan["memory"]/2**20))
+
+def SweepChunks(sortedCircuit, Circuit, Frequencies, RSval, RLval, Source, Sourcetype, Names, Plan):
+    # Function : SweepChunks
+    # Runs the sweep a chunk of frequencies at a time as set out in the plan, giving
+    # back each chunk in order. With more than one worker the chunks are calculated
+    # on a pool of threads, with only a few chunks ahead of the one being used so the
+    # memory stays bounded.
+
+    # Inputs: [sortedCircuit : circuitBlock List], [Circuit : circuitTable], [Frequencies : float array],
+    #   [RSval : float], [RLval : float], [Source : float], [Sourcetype : Integer],
+    #   [Names : String List], [Plan : Dictionary]
+
+    # Output: generator of [FrequencyChunk : float array], [FrequencyMasterMatrix : Dictionary of complex arrays]
+
+    def runChunk(start):
+        FrequencyChunk = Frequencies[start:start+Plan["chunk"]]
+        return FrequencyChunk, Sweep(sortedCircuit, Circuit, FrequencyChunk, RSval, RLval, Source, Sourcetype, Names, Plan["engine"])
+
+    starts = range(0, len(Frequencies), Plan["chunk"])
+    if Plan["workers"] == 1:
+        for start in starts:
+            yield runChunk(start)
+        return
+
+    #Only loaded when threads are used, to keep the start up of small runs quick
+    import collections
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(Plan["workers"]) as executor:
+        pending = collections.deque()
+        for start in starts:
+            pending.append(executor.submit(runChunk, start))
+            if len(pending) > Plan["workers"]:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def CalculateColumns(A, B, C, D, Rs, Rl, Source, SourceType, Names=OutputNames):
+    # Function : CalculateColumns
+    # Batched version of circuitBlock.calculateAll. Takes the A, B, C and D values of
+    # the overall circuit at every frequency as arrays and calculates the requested
+    # outputs for all frequencies at once. Outputs that arent requested (and arent
+    # needed by one that is) are never calculated.
+
+    # With arrays of terminations (see TerminationGrid) each output has a row for
+    # each frequency and a column for each combination of terminations.
+
+    # Input : [A : complex array], [B : complex array], [C : complex array], [D : complex array],
+    #   [Rs : float], [Rl : float], [Source : float], [SourceType: Integer],
+    #   [Names : String List] - the outputs to calculate, all of them by default
+
+    # Output : [Columns : Dictionary of complex arrays]
+
+    if np.ndim(Rs) > 0:
+        A, B, C, D = [np.asarray(value)[..., None] for value in [A, B, C, D]]
+    Outputs = outputColumns(A, B, C, D, Rs, Rl, Source, SourceType)
+    return {name: Outputs[name] for name in Names}
+
+def BatchedSweep(Circuit, Frequencies, RSval, RLval, Source, Sourcetype, Reduction="chain", Names=OutputNames):
+    # Function : BatchedSweep
+    # Vectorised frequency sweep. The ABCD matrices of the components are built over
+    # the whole frequency grid at once and the cascade is done with batched
+    # (Nfreqs x 2 x 2) products instead of one 2x2 product per component per
+    # frequency. The outputs are then calculated for all frequencies in one go,
+    # giving the same values as ScalarSweep.
+
+    # Inputs: [Circuit : circuitTable], [Frequencies : float array], [RSval : float],
+    #   [RLval : float], [Source : float], [Sourcetype : Integer],
+    #   [Reduction : String] - "chain" (left to right) or "tree" (pairwise),
+    #   [Names : String List] - the outputs to calculate, all of them by default
+
+    # Output: [FrequencyMasterMatrix : Dictionary of complex arrays]
+
+    # A circuit that folded down to a single fixed block is the same at every
+    # frequency, so it is only evaluated once and repeated for every frequency.
+    if len(Circuit) == 1 and Circuit.fixed[0]:
+        matrix = Circuit.constant[0]
+        Values = CalculateColumns(matrix[0, 0], matrix[0, 1], matrix[1, 0], matrix[1, 1],
+                                  RSval, RLval, Source, Sourcetype, Names)
+        return {name: np.full((len(Frequencies),)+np.shape(Values[name]), Values[name]) for name in Values}
+
+    if Reduction == "tree":
+        matrix = CascadeTree(Circuit, Frequencies)
+    else:
+        matrix = CascadeChain(Circuit, Frequencies)
+    return CalculateColumns(matrix[:, 0, 0], matrix[:, 0, 1], matrix[:, 1, 0], matrix[:, 1, 1],
+                            RSval, RLval, Source, Sourcetype, Names)
+
+def MonteCarloSweep(Circuit, Samples, Frequencies, RSval, RLval, Source, Sourcetype, Names=OutputNames):
+    # Function : MonteCarloSweep
+    # Sweeps many copies of a circuit at once, each with its own component values.
+    # The overall A, B, C and D values are kept as (Nsamples x Nfreqs) arrays and each
+    # component is multiplied in with the elements of its matrix rather than a 2x2
+    # product: a series component [[1, Z], [0, 1]] only adds A*Z to B and C*Z to D,
+    # and a shunt one [[1, 0], [Y, 1]] only adds B*Y to A and D*Y to C.
+
+    # Inputs: [Circuit : circuitTable] - not folded, [Samples : float array (Nsamples x Ncomponents)] -
+    #   the component values of each sample, [Frequencies : float array], [RSval : float],
+    #   [RLval : float], [Source : float], [Sourcetype : Integer], [Names : String List]
+
+    # Output : [Columns : Dictionary of complex arrays (Nsamples x Nfreqs)]
+
+    omega = 2j*math.pi*np.asarray(Frequencies)
+    shape = (len(Samples), len(Frequencies))
+    A = np.ones(shape, dtype=complex)
+    B = np.zeros(shape, dtype=complex)
+    C = np.zeros(shape, dtype=complex)
+    D = np.ones(shape, dtype=complex)
+    for index, (series, oneover, freqdependant) in enumerate(zip(
+            Circuit.series.tolist(), Circuit.oneover.tolist(), Circuit.freqdependant.tolist())):
+        # The same operations as circuitBlock.applyFreq, for every sample and frequency
+        z = Samples[:, index, None]
+        if freqdependant:
+            z = z*omega
+        if oneover:
+            z = 1/z
+        if series:
+            B += A*z
+            D += C*z
+        else:
+            y = 1/z
+            A += B*y
+            C += D*y
+    return CalculateColumns(A, B, C, D, RSval, RLval, Source, Sourcetype, Names)
+
+#Netlist grammar used by InputRead. The tags have to match the whole line once the
+# comment is removed, the keys are matched without case.
+SIPrefixes = frozenset(["a", "f", "p", "n", "u", "m", "k", "M", "G", "T", "P", "E"])
+#A line in a block is only read if its first word starts with one of these.
+CircuitStarts = frozenset(["N1", "N2", "C=", "R=", "G=", "L="])
+TermStarts = frozenset(["VT", "RS", "RL", "IN", "GS", "FS", "FE", "NF", "LF"])
+#What each key in the <CIRCUIT> and <TERMS> blocks defines.
+CircuitKeys = {"N1": "n1", "N2": "n2", "C": "value", "R": "value", "G": "value", "L": "value", "TOL": "tol"}
+TermKeys = {"VT": "source", "IN": "source", "RS": "rs", "GS": "gs", "RL": "load",
+            "FSTART": "start", "LFSTART": "start", "FEND": "end", "LFEND": "end", "NFREQS": "nfreqs"}
+#Frequency type of each frequency key: 1 is linear, 2 is logarithmic.
+FrequencyTypes = {"FSTART": 1, "FEND": 1, "LFSTART": 2, "LFEND": 2}
+#The strings int() accepts (a word never has spaces in it), so no exception is needed to check.
+IntegerPattern = re.compile(r"[+-]?\d+(?:_\d+)*")
+#The usual component line, "n1=1 n2=2 R=100" with nothing else on it. These lines are
+# read straight from the match, any other line is split into words.
+ComponentPattern = re.compile(r"\s*[nN]1=(\d+)\s+[nN]2=(\d+)\s+([CRGLcrgl])=([^\s=]+)\s*")
+
+def MergePrefixes(lineword):
+    # Function : MergePrefixes
+    # Joins an SI prefix written as a word of its own onto the word before it, so
+    # "R=25 k" is read as "R=25k". The word straight after a joined prefix is always
+    # kept as it is, even if it is a prefix too.
+    # Inputs: [lineword : String List] - the words of a line
+    # Output: [merged : String List]
+    merged = [lineword[0]]
+    num = 1
+    while num < len(lineword):
+        if lineword[num] in SIPrefixes:
+            merged[-1] = merged[-1]+lineword[num]
+            if num+1 < len(lineword):
+                merged.append(lineword[num+1])
+            num += 2
+        else:
+            merged.append(lineword[num])
+            num += 1
+    return merged
+
+def InputRead(FileLines, Fourier=False):
     #Function : InputRead
     # This is the main bulk of the program converting the user input into
     # meaningful data. Using this data, the program extracts relevant information
     # and begins to define the circuit block order. It also defines the frequency
     # range and values.
+    # Each line is read once: the comment is cut off, the line is split into words
+    # and each "key=value" word is looked up in CircuitKeys or TermKeys.
 
-    # Input: [FileLines: String List]
+    # Input: [FileLines: String List], [Fourier: boolean] - fourier mode needs linear frequencies
 
     # Output: [error:boolean], [unsortedCircuit: circuitBlock List], [Source: float],
     #   [Sourcetype: String], [RSval: flaot], [RLval: float], [Frequencies: float List], [OutputOrder: String 2D List (2 Columns)]
+    #   Source, RSval and RLval are float arrays instead when a list of values is given (see TermValue).
 
     #Variables defined for validation checks
     circuitOpen = False
@@ -271,215 +909,169 @@ def InputRead(FileLines):
     circuitTag=False
     termsTag=False
     outputTag=False
-    expPref= ["a","f","p","n","u","m","k","M","G","T","P","E"]
+    isInteger = IntegerPattern.fullmatch
+    componentLine = ComponentPattern.fullmatch
+    #The components found, their values are converted together once every line is read.
+    componentRows = []
+    componentValues = []
+
     #Checks each line in the file lines list
-    
     for word in FileLines:
         #removes all comments
-        word,_,_=word.partition("#")
+        word = word.partition("#")[0]
 
         #Tries to match the line with a tag name to evaluate what
         # is being defined.
-        if word == "<CIRCUIT>":
-            circuitOpen = True
-        if word == "</CIRCUIT>":
-            if circuitOpen==True:
-                circuitTag=True
-            circuitOpen = False
-        if word == "<TERMS>":
-            termsOpen = True
-        if word == "</TERMS>":
-            if termsOpen==True:
-                termsTag=True
-            termsOpen = False
-        if word == "<OUTPUT>":
-            outputOpen = True
-        if word == "</OUTPUT>":
-            if outputOpen==True:
-                outputTag=True
-            outputOpen = False
+        if word[0:1] == "<":
+            if word == "<CIRCUIT>":
+                circuitOpen = True
+            elif word == "</CIRCUIT>":
+                circuitTag = circuitTag or circuitOpen
+                circuitOpen = False
+            elif word == "<TERMS>":
+                termsOpen = True
+            elif word == "</TERMS>":
+                termsTag = termsTag or termsOpen
+                termsOpen = False
+            elif word == "<OUTPUT>":
+                outputOpen = True
+            elif word == "</OUTPUT>":
+                outputTag = outputTag or outputOpen
+                outputOpen = False
+
+        if not (circuitOpen or termsOpen or outputOpen):
+            continue
+
+        #The usual component line. It cant define anything in the other blocks.
+        if circuitOpen:
+            match = componentLine(word)
+            if match is not None:
+                componentRows.append((int(match.group(1)), int(match.group(2)), match.group(3).upper(), None))
+                componentValues.append(match.group(4))
+                continue
+
+        lineword = word.split()
+        if len(lineword) == 0:
+            continue
+        #Joins the prefix with the previous item - had to implement this as initially
+        # I assumed the number and prefix wouldnt have a space in between.
+        merged = lineword
+        if len(lineword) > 1 and not SIPrefixes.isdisjoint(lineword[1:]):
+            merged = MergePrefixes(lineword)
 
         #If the circuit tag is open:
-        if circuitOpen == True:
-            lineword = word.split()
-            if len(lineword)>0:
-                if len(lineword[0]) > 1:
-
-                    #Joins the prefix with the previous item - had to implement this as initially
-                    # I assumed the number and prefix wouldnt have a space in between.
-                    for num,delPref in enumerate(lineword):
-                        if delPref in expPref and num !=0:
-                            lineword[num-1]=lineword[num-1]+lineword[num]
-                            lineword.pop(num)
-
-                    #Checks if the line is relevant and stores it accordingly
-                    #Program allows the order of each variable to be in any order. (using "in")
-
-                    if lineword[0][0:2].upper() in ["N1", "N2", "C=", "R=", "G=", "L="]:
-                        
-                        n1found = False
-                        n2found = False
-                        compfound = False
-                        #Goes through each item in lineword to iterate through each variable definition
-                        for termword in lineword:
-                            #Seperates item by equals sign
-                            namevalue = termword.split("=")
-                            if len(namevalue)>1:
-                                #The following lines filter the line into their category
-                                #And store them, updating the necessary values.
-                                if namevalue[0].upper() == "N1":
-                                    n1found = True
-                                    try:
-                                        n1 = int(namevalue[1])
-                                    except:
-                                        n1found=False
-                                elif namevalue[0].upper() == "N2":
-                                    n2found = True
-                                    try:
-                                        n2 = int(namevalue[1])
-                                    except:
-                                        n2found=False
-                                elif namevalue[0].upper() in ["C", "R", "G", "L"]:
-                                    compfound = True
-                                    compValue = ValueConvert(namevalue[1])  #Allows for conversion if the
-                                                                            #value is defined using exponent prefix
-                                    if compValue == "error":
-                                        compfound=False
-                                    elif compValue<=0:
-                                        compfound=False
-                                    else:
-                                        compName = namevalue[0].upper()
-                                        if compName in ["C", "L"]:
-                                            FrequencyDependant = True
-                                else:# If the line has other uncommented random words, create an error
-                                    error=True
-                            else:# If the line has other uncommented random words, create an error
-                                error=True
-                        #Validation checks to see if all three definitions were found. and that the series nodes
-                        # definition is correct
-
-                        if n1found == True and n2found == True and compfound == True:
-                            unsortedCircuit.append(circuitBlock(n1, n2, compName, compValue))
-                            if abs(n1-n2)>1 and n1*n2 !=0:
-                                error = True
-                        else:
-                            #If the component was to be defined but there was missing information
-                            #an error is flagged
-                            error = True
-
-        if termsOpen == True:
-            lineword = word.split()
-            # used lineword because whitespace is removed
-            if len(lineword)>0:
-                if len(lineword[0])>2:
-                    #Joins the prefix with the previous item
-                    for num,delPref in enumerate(lineword):
-                        if delPref in expPref and num !=0:
-                            lineword[num-1]=lineword[num-1]+lineword[num]
-                            lineword.pop(num)
-                    #Checks if the information in the line is relevant variables or comments
-                    if lineword[0][0:2].upper() in ["VT", "RS", "RL", "IN", "GS", "FS", "FE", "NF", "LF"]:
-                        #iterates through each word in the line that is split by a space
-                        for termword in lineword:
-                            namevalue = termword.split("=")
-                            #Filters again to check if a varible is being defined
-                            # If it is, the relevant variables and validity checks are performed.
-                            # For each variable, it is checked if it is part of the variables the program is looking for
-                            # If the program matches with it, the boolean to signify that the variable is found is turned to true
-                            # 
-                            # Validation checks are carreid out on each variable - these check if it is a suitable value
-
-
-                            if len(namevalue)>1:
-                                if namevalue[0].upper() == "VT":
-                                    Sourcetype = 1
-                                    Source = ValueConvert(namevalue[1])
-                                    if Source == "error":
-                                        Sourcetype = 0
-                                    elif Source <=0:
-                                        Sourcetype=0
-                                if namevalue[0].upper() == "IN":
-                                    Sourcetype = 2
-                                    Source = ValueConvert(namevalue[1])
-                                    if Source == "error":
-                                        Sourcetype = 0
-                                    elif Source <=0:
-                                        Sourcetype=0
-                                if namevalue[0].upper() == "RS":
-                                    RSfound = True
-                                    RSval = ValueConvert(namevalue[1])
-                                    if RSval == "error":
-                                        RSfound = False
-                                    elif RSval <0:
-                                        RSfound=False
-                                if namevalue[0].upper() == "GS":
-                                    RSfound = True
-                                    try:
-                                        RSval = 1/ValueConvert(namevalue[1])
-                                    except:
-                                        RSval="error"
-                                    if RSval == "error":
-                                        RSfound = False
-                                    elif RSval <0:
-                                        RSfound=False
-                                if namevalue[0].upper() == "RL":
-                                    Loadfound = True
-                                    RLval = ValueConvert(namevalue[1])
-                                    if RLval == "error":
-                                        Loadfound = False
-                                    elif RLval <=0:
-                                        Loadfound=False
-                                if namevalue[0].upper() == "FSTART":
-                                    Freqtype = 1
-                                    FStart = ValueConvert(namevalue[1])
-                                    if FStart == "error":
-                                        Freqtype = 0
-                                    elif FStart <0:
-                                        Freqtype=0
-                                if namevalue[0].upper() == "FEND":
-                                    Freqtype2 = 1
-                                    Fend = ValueConvert(namevalue[1])
-                                    if Fend == "error":
-                                        Freqtype2 = 0
-                                    elif Fend <0:
-                                        Freqtype2=0
-                                if namevalue[0].upper() == "NFREQS":
-                                    noff = True
-                                    try:
-                                        numFreq = int(namevalue[1])
-                                        if numFreq<=0:
-                                            noff=False
-                                    except:
-                                        noff = False
-
-                                if namevalue[0].upper() == "LFSTART":
-                                    Freqtype = 2
-                                    FStart = ValueConvert(namevalue[1])
-                                    if FStart == "error":
-                                        Freqtype = 0
-                                    elif FStart <0:
-                                        Freqtype=0
-                                if namevalue[0].upper() == "LFEND":
-                                    Freqtype2 = 2
-                                    Fend = ValueConvert(namevalue[1])
-                                    if Fend == "error":
-                                        Freqtype2=0
-                                    elif Fend <0:
-                                        Freqtype2=0
+        #Program allows the order of each variable to be in any order.
+        if circuitOpen and len(lineword[0]) > 1 and lineword[0][0:2].upper() in CircuitStarts:
+            n1found = False
+            n2found = False
+            compText = None
+            tolerance = None
+            #Goes through each item in the line to iterate through each variable definition
+            for termword in merged:
+                #Seperates item by equals sign
+                namevalue = termword.split("=", 2)
+                key = CircuitKeys.get(namevalue[0].upper()) if len(namevalue) > 1 else None
+                if key == "n1":
+                    n1found = namevalue[1].isdecimal() or isInteger(namevalue[1]) is not None
+                    if n1found:
+                        n1 = int(namevalue[1])
+                elif key == "n2":
+                    n2found = namevalue[1].isdecimal() or isInteger(namevalue[1]) is not None
+                    if n2found:
+                        n2 = int(namevalue[1])
+                elif key == "value":
+                    #Only the last value on the line is used, but a valid capacitor or
+                    # inductor value before it still makes the circuit frequency dependant.
+                    if compText is not None and compName in ["C", "L"]:
+                        compValue = ValueConvert(compText)
+                        if compValue != "error" and not compValue<=0:
+                            FrequencyDependant = True
+                    compText = namevalue[1]
+                    compName = namevalue[0].upper()
+                elif key == "tol":
+                    #Tolerance of the component for the monte carlo analysis
+                    tolerance = ToleranceValue(namevalue[1])
+                    if tolerance == "error":
+                        error = True
+                else:# If the line has other uncommented random words, create an error
+                    error=True
+            #Validation checks to see if all three definitions were found. The value is
+            # checked once all of them are converted.
+            if n1found and n2found and compText is not None:
+                componentRows.append((n1, n2, compName, tolerance))
+                componentValues.append(compText)
+            else:
+                #If the component was to be defined but there was missing information
+                #an error is flagged
+                error = True
+
+        #If the terms tag is open, the relevant variables and validity checks are performed.
+        # Validation checks are carreid out on each variable - these check if it is a suitable value
+        if termsOpen and len(lineword[0]) > 2 and lineword[0][0:2].upper() in TermStarts:
+            for termword in merged:
+                namevalue = termword.split("=", 2)
+                if len(namevalue) < 2:
+                    continue
+                name = namevalue[0].upper()
+                key = TermKeys.get(name)
+                if key == "source":
+                    Source = TermValue(namevalue[1])
+                    Sourcetype = 0
+                    if not isinstance(Source, str) and not np.any(Source <= 0):
+                        Sourcetype = 1 if name == "VT" else 2
+                elif key == "rs":
+                    RSval = TermValue(namevalue[1])
+                    RSfound = not isinstance(RSval, str) and not np.any(RSval < 0)
+                elif key == "gs":
+                    conductance = TermValue(namevalue[1])
+                    RSval = "error"
+                    if not isinstance(conductance, str) and not np.any(conductance == 0):
+                        RSval = 1/conductance
+                    RSfound = not isinstance(RSval, str) and not np.any(RSval < 0)
+                elif key == "load":
+                    RLval = TermValue(namevalue[1])
+                    Loadfound = not isinstance(RLval, str) and not np.any(RLval <= 0)
+                elif key == "start":
+                    FStart = ValueConvert(namevalue[1])
+                    Freqtype = 0
+                    if FStart != "error" and not FStart < 0:
+                        Freqtype = FrequencyTypes[name]
+                elif key == "end":
+                    Fend = ValueConvert(namevalue[1])
+                    Freqtype2 = 0
+                    if Fend != "error" and not Fend < 0:
+                        Freqtype2 = FrequencyTypes[name]
+                elif key == "nfreqs":
+                    noff = isInteger(namevalue[1]) is not None
+                    if noff:
+                        numFreq = int(namevalue[1])
+                        noff = numFreq > 0
 
         # if the output tag is open:
-        if outputOpen == True:
-            lineword = word.split()  # Check its not a comment
-            # used lineword because whitespace is removed
-            #checks if the line is defining a output variable name
-            if len(lineword)>0:
-                if lineword[0] in ["Vin", "Vout", "Iin", "Iout", "Pin", "Pout", "Zin", "Zout", "Av", "Ai"]:
-                    if len(lineword) > 1:
-                        #If it is, store the unit and name
-                        OutputOrder.append([lineword[0], lineword[1]])
-                    else:
-                        #If there isnt any unit use L as the unit.
-                        OutputOrder.append([lineword[0], "L"])
+        #checks if the line is defining a output variable name
+        if outputOpen and lineword[0] in OutputNames:
+            if len(lineword) > 1:
+                #If it is, store the unit and name
+                OutputOrder.append([lineword[0], lineword[1]])
+            else:
+                #If there isnt any unit use L as the unit.
+                OutputOrder.append([lineword[0], "L"])
+
+    #Converts all the component values (with thier prefixes) in one go. Each component
+    # needs a valid value above zero, and the series nodes definition has to be correct.
+    valueErrors, values = ValueConvertArray(componentValues)
+    valueErrors |= values<=0
+    for (n1, n2, compName, tolerance), compValue, valueError in zip(componentRows, values.tolist(), valueErrors.tolist()):
+        if valueError:
+            error = True
+            continue
+        if compName in ["C", "L"]:
+            FrequencyDependant = True
+        unsortedCircuit.append(circuitBlock(n1, n2, compName, compValue))
+        if tolerance is not None:
+            unsortedCircuit[-1].tol = tolerance
+        if abs(n1-n2)>1 and n1*n2 !=0:
+            error = True
 
     #Validity checks
     #Checks all the required terms are defined
@@ -503,6 +1095,145 @@ def InputRead(FileLines):
             Frequencies = np.logspace(np.log10(FStart), np.log10(Fend), numFreq)
         return error, unsortedCircuit, Source, Sourcetype, RSval, RLval, Frequencies, OutputOrder
 
+def OptionValue(Options, name, default):
+    # Function : OptionValue
+    # Returns the value given to a command line option in the form --name=value,
+    # or the default if the option wasnt given.
+
+    # Inputs: [Options : String List], [name : String], [default : String]
+
+    # Output: [String]
+
+    for option in Options:
+        if option.startswith(name+"="):
+            return option[len(name)+1:]
+    return default
+
+def OutputCommas(OutputOrder):
+    # Function : OutputCommas
+    # Works out the seperator written after each output in the file. Every output
+    # is followed by a comma apart from the last one.
+
+    # Inputs: [OutputOrder : String 2D List]
+
+    # Output: [commas : String List]
+
+    commas = []
+    comma = ","
+    for h in OutputOrder:
+        if h[0:2] == OutputOrder[-1][0:2]:
+            comma = ""
+        commas.append(comma)
+    return commas
+
+def OutputTitles(OutputOrder, Fourier=False, Leading=[]):
+    # Function : OutputTitles
+    # Formats the two title lines at the top of the output file - the name of each
+    # column and then its unit. The first column is the frequency, or the time
+    # for a fourier transform, followed by the terminations in a termination sweep.
+
+    # Inputs: [OutputOrder : String 2D List], [Fourier : boolean],
+    #   [Leading : List of (name, unit, ...)] - the termination columns (see TerminationColumns)
+
+    # Output: [line1 : String], [line2 : String]
+
+    if Fourier:
+        line1 = "{message: >{width}}".format(message="TIME,", width=11)
+        line2 = "{message: >{width}}".format(message="Sec,", width=11)
+    else:
+        line1 = "{message: >{width}}".format(message="Freq,", width=11)
+        line2 = "{message: >{width}}".format(message="Hz,", width=11)
+    for column in Leading:
+        line1 = line1+"{message: >{width}}".format(message=column[0]+",", width=12)
+        line2 = line2+"{message: >{width}}".format(message=column[1]+",", width=12)
+
+    for h, comma in zip(OutputOrder, OutputCommas(OutputOrder)):
+        if "dB" in h[1]:
+            title1a = "{message: >{width}}".format(message="|"+h[0]+"|"+",", width=12)
+            title1b = "{message: >{width}}".format(message="/_"+h[0], width=11)
+            line1 = line1+title1a+title1b+comma
+            title1a = "{message: >{width}}".format(message=h[1]+",", width=12)
+            title1b = "{message: >{width}}".format(message="rads", width=11)
+            line2 = line2+title1a+title1b+comma
+        else:
+            title1a = "{message: >{width}}".format(message="Re("+h[0]+"),", width=12)
+            title1b = "{message: >{width}}".format(message="Im("+h[0]+")", width=11)
+            line1 = line1+title1a+title1b+comma
+            title1a = "{message: >{width}}".format(message=h[1], width=11)
+            line2 = line2+title1a+","+title1a+comma
+    return line1, line2
+
+def OutputRows(FirstColumn, Columns, OutputOrder, Fourier=False, Leading=[]):
+    # Function : OutputRows
+    # Formats the values of the output file a whole column at a time. Each column is
+    # converted to its unit (or dB and phase) with one call to ValueConvert, then every
+    # row is written with one format string made up of all of its cells.
+    # Normal output right justifies each value, "{:.3e}" padded to the column width is
+    # the same as "%11.3e". Fourier output puts a space before positive values instead.
+
+    # In a termination sweep each frequency (or time) has a row for every combination
+    # of terminations, starting with the values of the terminations.
+
+    # Inputs: [FirstColumn : float array] - the frequencies or times,
+    #   [Columns : complex array List] - the values of each output, in the same order as OutputOrder,
+    #   [OutputOrder : String 2D List], [Fourier : boolean],
+    #   [Leading : List of (name, unit, float array)] - the termination columns (see TerminationColumns)
+
+    # Output: [outputValueLine : String List]
+
+    commas = OutputCommas(OutputOrder)
+    if Fourier:
+        template = " %.3e, "
+    else:
+        template = " %.3e,"
+    if Leading:
+        combinations = len(Leading[0][2])
+        rowValues = [np.repeat(FirstColumn, combinations).tolist()]
+        for column in Leading:
+            rowValues.append(np.tile(column[2], len(FirstColumn)).tolist())
+            template = template+(" %.3e, " if Fourier else "%11.3e,")
+        Columns = [np.ravel(values) for values in Columns]
+    else:
+        rowValues = [np.asarray(FirstColumn).tolist()]
+
+    for h, values, comma in zip(OutputOrder, Columns, commas):
+        argu1, argu2 = ValueConvert(np.asarray(values), h[1], h[0])
+        if Fourier:
+            template = template+"%s%.3e, %s%.3e"+comma+" "
+            rowValues.append(np.where(argu1 < 0, "", " ").tolist())
+            rowValues.append(argu1.tolist())
+            rowValues.append(np.where(argu2 < 0, "", " ").tolist())
+            rowValues.append(argu2.tolist())
+        else:
+            template = template+"%11.3e,%11.3e"+comma
+            rowValues.append(argu1.tolist())
+            rowValues.append(argu2.tolist())
+
+    return [template % row for row in zip(*rowValues)]
+
+#Multiplier for each SI prefix a value can end with.
+SIExponents = {
+    "a": 1e-18,
+    "f": 1e-15,
+    "p": 1e-12,
+    "n": 1e-9,
+    "u": 1e-6,
+    "m": 1e-3,
+    "k": 1e3,
+    "M": 1e6,
+    "G": 1e9,
+    "T": 1e12,
+    "P": 1e15,
+    "E": 1e28
+}
+#The numbers float() accepts: digits (with single underscores between them), a
+# decimal point and an exponent, or inf, infinity and nan in any case.
+NumberGrammar = (r"[+-]?(?:(?:\d(?:_?\d)*(?:\.(?:\d(?:_?\d)*)?)?|\.\d(?:_?\d)*)(?:[eE][+-]?\d(?:_?\d)*)?"
+                 r"|[iI][nN][fF](?:[iI][nN][iI][tT][yY])?|[nN][aA][nN])")
+#A value in the netlist: a number, then an optional SI prefix. Like float() spaces
+# are allowed around the number.
+ValuePattern = re.compile(r"(\s*"+NumberGrammar+r"\s*)([afpnumkMGTPE]?)")
+
 def ValueConvert(value, unit="", name=""):
     # Function : ValueConvert
     # This function converts a value with an exponent attatched to it
@@ -520,7 +1251,6 @@ def ValueConvert(value, unit="", name=""):
     #                   or
     # Output: [Real : float],[Imaginary : float]
 
-    #Dictionary with all exponents
     """
 
         >>> ValueConvert("2n")
@@ -539,34 +1269,17 @@ def ValueConvert(value, unit="", name=""):
         'error'
         
     """
-    exponent = {
-        "a": 1e-18,
-        "f": 1e-15,
-        "p": 1e-12,
-        "n": 1e-9,
-        "u": 1e-6,
-        "m": 1e-3,
-        "k": 1e3,
-        "M": 1e6,
-        "G": 1e9,
-        "T": 1e12,
-        "P": 1e15,
-        "E": 1e28
-    }
-
     #If the unit is empty then the function is in input reading mode.
     if unit == "":
-        try:
-            #First checks if the value is a float already
-            return float(value)
-        except:
-            # If it isnt, that means there is an exponent attatched
-            # So the float is multiplied by the exponent
-            try:
-                return exponent[value[-1]]*float(value[0:-1])
-            except:
-                #If the exponent is invalid an error is thrown
-                return "error"
+        #The value is matched against the number grammar so no exception is needed
+        # to find out if it is valid. A prefix on the end multiplies the number.
+        match = ValuePattern.fullmatch(value)
+        if match is None:
+            return "error"
+        number, prefix = match.groups()
+        if prefix == "":
+            return float(number)
+        return SIExponents[prefix]*float(number)
     else:
         if "dB" in unit:  # then check exponent prefix for things like dBuV
             unit = unit.replace("dB", "")
@@ -578,7 +1291,7 @@ def ValueConvert(value, unit="", name=""):
                 mltp=20
                 if name == "Pin" or name == "Pout":
                     mltp=10
-                return mltp*np.log10(np.abs(value)/exponent[unit[0]]), np.angle(value)
+                return mltp*np.log10(np.abs(value)/SIExponents[unit[0]]), np.angle(value)
             except:
                 try:
                     #If there is no exponent, the calculations wihtout exponents are carried out.
@@ -587,784 +1300,1232 @@ def ValueConvert(value, unit="", name=""):
                         mltp=10
                     return mltp*np.log10(np.abs(value)), np.angle(value)
                 except:#If an invalid unit is defined the program will end up here
-                    outputfile.close()
-                    exit()
+                    raise ValueError("Invalid output unit: dB"+unit)
         try:
-            return value.real/exponent[unit[0]], value.imag/exponent[unit[0]]
+            return value.real/SIExponents[unit[0]], value.imag/SIExponents[unit[0]]
         except:
             return value.real, value.imag
 
 
-                            ################################
-                                #   START OF PROGRAM    #
-                            ################################
-
-#UNIT TESTING
-def Testing():
-    #Cannot Use Doctest as these are too complex and require outside files.
-
-    
-    print("Class 'circuitBlock' Test Started:")
-    fail=False
-    TestFile=open("TestingData.csv","r")
-    #This is from prior knowledge, i know all variables are stored in this order.
-    #It will be used to extract the output order in the excel file
-    allTerms=["Vin", "Vout", "Iin", "Iout", "Pin", "Pout", "Zin", "Zout", "Av", "Ai"]
-    for LineNum,TestFileLine in enumerate(TestFile):
-        linein=TestFileLine.replace("\n","").split(",")
-        if LineNum%5==1:#Every 5n+1 line
-            
-            #Known Order Save all values from the file in thier corresponding variables
-            n1=int(linein[0])
-            n2=int(linein[1])
-            Rs=float(linein[2])
-            Rl=float(linein[3])
-            Frqs=float(linein[4])
-            CompN=linein[5]
-            CompV=float(linein[6])
-            SrcType=int(linein[7])
-            SrcVal=float(linein[8])
-
-            #Create a component depending on the variables above
-            Node=circuitBlock(n1,n2,CompN,CompV)
-        if LineNum%5==3:#Every 5n+3 line
-            works=False
-            try:#Uses try to check if its computable
-
-                #applies a frequency and calculates all outputs depending on the file input
-                Node.applyFreq(Frqs)
-                answer=Node.calculateAll(Rs,Rl,SrcVal,SrcType)
-                works=True
-            except:
-                #If there was an error, the file should also show error - otherwise it fails the test
-                if linein[0]!="error":#TODO: Doctest
-                    fail=True
-            if works == True:
-                listOfAnswers=[answer[allTermsx] for allTermsx in allTerms]#Iterates through each value in file
-                #and stores it in an array
-
-                #Compares every output in the file agains the output from the calculateAll dictionary values
-                # If any arent matching, the boolean fail will be true.
-                for count,compareVal in enumerate(listOfAnswers):
-                    compareValRound=round(compareVal.real,5)+round(compareVal.imag,5)*1j
-                    if compareValRound != complex(linein[count]):#TODO:DOCTEST
-                        fail=True
-
-    #Final Result
-    if fail:
-        print("Test Failed\n")
-    else:
-        print("All Tests Passed\n")
-    TestFile.close()
-    
-    original=[]
-    Test2=[]
-    TestFile2=open("ValidFile.net","r")
-    for Tline in TestFile2:
-        Test2.append(Tline.replace("\n", ""))
-        original.append(Tline.replace("\n", ""))
-    TestFile2.close()
-
-
-
-    print("Class 'circuitBlock' Test Multiple Elements:")#multiple elements
-    fail=False
-    Rs=50
-    Rl=50
-    Vs=5
-    A = circuitBlock(1, 0, "R", 150)
-    B = circuitBlock(1, 2, "R", 150)
-    A.applyFreq()
-    B.applyFreq()
-    A.multM(B)
-    answersTest=[3.2,0.79,0.037,0.016,0.12,0.012,86,190,0.25,0.43]
-    dictOut=A.calculateAll(Rs, Rl, Vs, 1)
-    for indexx,nameDict in enumerate(allTerms):
-        compareVal=dictOut[nameDict]
-        compareValRound=float("{:.1e}".format(compareVal.real))
-        if compareValRound!=answersTest[indexx]:
-            fail=True
-    if fail:
-        print("Test Failed\n")
-    else:
-        print("Test Passed\n")
-
-
-    print("Valid Test 1 for InputRead()")
-    error, Circ, Source, Sourcetype, RSval, RLval, Frequencies, OutOrd=InputRead(Test2)
-
-    t1f=False
-
-    correctOrd=[['Vin', 'V'], ['Vout', 'V'], ['Iin', 'A'], ['Iout', 'A'], ['Pin', 'W'], ['Zout', 'Ohms'], ['Pout', 'W'], ['Zin', 'Ohms'], ['Av', 'L'], ['Ai', 'L']]
-    if OutOrd!=correctOrd:
-        t1f=True
-    
-    if len(Circ)!=10:
-        t1f=True
-    correct=[[4,0,82],[4,5,25000],[2,0,1e-05],[2,3,150],[4,0,1.25e-05],[6,0,100],[5,6,2],[3,4,3.3],[5,0,3e-09],[1,2,47000]]
-    for g in range(0,10):
-        comparex=[Circ[g].n1,Circ[g].n2,Circ[g].val]
-        if comparex!=correct[g]:
-            t1f=True
-
-    if error or t1f or Source !=5 or Sourcetype != 1 or RSval != 50 or RLval != 75 or (Frequencies != [10,20,30,40]).any():
-        print("Failed")
-    else:
-
-        print("Passed")
-    
-
-
-
-
-
-    print("Valid Test 2 for InputRead()")
-    #Modifying the file so all definitions are on the same line and
-    # It uses a logarithmic sweep
-    for _ in range(0,6):
-        Test2.pop(20)
-    Test2[20]=Test2[20].replace("#","")
-    _, _, _, _, _, _, Frequencies, _=InputRead(Test2)
-    if (Frequencies == [10,100,1000,10000,100000,1000000,10000000]).all():
-        print("Passed")
-    else:
-        print("Failed")
-
-
-    print("\nInvalid tests inside <circuit> tag:\n")
-    print("Invalid Test 3 for InputRead()")
-    Test3=original.copy()
-    Test3[0]=""
-    error, _, _, _, _, _, _, _=InputRead(Test3)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-    
-    print("Invalid Test 4 for InputRead()")
-    Test=original.copy()
-    Test[1]="n1=3.5 n2=4 R=1"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-    print("Invalid Test 5 for InputRead()")
-    Test=original.copy()
-    Test[1]="n1=3 n2=4.5 R=1"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-
-    print("Invalid Test 6 for InputRead()")
-    Test=original.copy()
-    Test[1]="n1=3 n2=4 R=-1"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-
-    print("Invalid Test 7 for InputRead()")
-    Test=original.copy()
-    Test[1]="n1=3 n2=4 C=kx"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-    print("Invalid Test 8 for InputRead()")
-    Test=original.copy()
-    Test[1]="n1=3 n2=4"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-
-    print("Invalid Test 9 for InputRead()")
-    Test=original.copy()
-    Test[1]="n2=4 R=1"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-    print("Invalid Test 10 for InputRead()")
-    Test=original.copy()
-    Test[1]="n1=4 R=1"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-
-    print("Invalid Test 11 for InputRead()")
-    Test=original.copy()
-    Test[1]="n1.=3 n2=4 R=1"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-
-    print("Invalid Test 11 for InputRead()")
-    Test=original.copy()
-    Test[1]="n1=3 n2 =4 R=1"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-
-    print("Invalid Test 11.1 for InputRead()")
-    Test=original.copy()
-    Test[1]="n1=3 n2=4 yol R=1"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-
-    
-    print("Invalid Test 11.2 for InputRead()")
-    Test=original.copy()
-    Test[1]="n1=3 n2=4 R=1 k k"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-
-    print("Invalid Test 11.3 for InputRead()")
-    Test=original.copy()
-    Test[1]="n1=3 n2=4 R=1 hello"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
+def ValueConvertArray(values):
+    # Function : ValueConvertArray
+    # Converts a whole list of value strings (like all the component values in a
+    # netlist) at once, in the same way as ValueConvert does in input reading mode.
+    # The prefix is taken off each value with the exponent table, then all the numbers
+    # are converted together. Only if one of them isnt a number is each value checked
+    # against the number grammar, to find which ones are invalid.
 
+    # Input : [values : String List]
+    # Output: [errors : boolean array] - True where the string isnt a valid value,
+    #   [numbers : float array] - 0 where there is an error
+    """
 
+        >>> ValueConvertArray(["2n", "1k", "50", "1H"])
+        (array([False, False, False,  True]), array([2.e-09, 1.e+03, 5.e+01, 0.e+00]))
 
-    print("\nInvalid Tests for <TERMS> tag:\n")
-    print("Invalid Test 12 for InputRead()")
-    Test=original.copy()
-    Test[20]="VT="
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
+    """
+    numbers = []
+    multipliers = []
+    for value in values:
+        prefix = value[-1:]
+        #inf and nan end with a prefix letter but are numbers on thier own
+        if prefix in SIExponents and value[-3:].lower() not in ["inf", "nan"]:
+            numbers.append(value[:-1])
+            multipliers.append(SIExponents[prefix])
+        else:
+            numbers.append(value)
+            multipliers.append(1.0)
+    try:
+        converted = list(map(float, numbers))
+        errors = np.zeros(len(numbers), dtype=bool)
+    except ValueError:
+        errors = np.array([ValuePattern.fullmatch(value) is None for value in values], dtype=bool)
+        converted = [0.0 if invalid else float(number) for number, invalid in zip(numbers, errors.tolist())]
+    return errors, np.array(converted, dtype=float)*np.array(multipliers, dtype=float)
+
+
+def TermValue(value):
+    # Function : TermValue
+    # Reads the value of a source, source resistance or load in the <TERMS> block.
+    # This is either one value, or a list of them for a termination sweep: values
+    # seperated by commas, where each item can also be a range "start:stop:n" of n
+    # equally spaced values, for example "RL=50,75,100:1k:10".
+
+    # Input : [value : String]
+    # Output: [float] for one value, [float array] for a list, or "error"
+    """
 
+        >>> TermValue("1k")
+        1000.0
+        >>> TermValue("50,75,100:200:3")
+        array([ 50.,  75., 100., 150., 200.])
+        >>> TermValue("50,,75")
+        'error'
 
-    print("Invalid Test 13 for InputRead()")
-    Test=original.copy()
-    Test[21]="RS=abc"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
+    """
+    if "," not in value and ":" not in value:
+        return ValueConvert(value)
+    values = []
+    for item in value.split(","):
+        parts = item.split(":")
+        if len(parts) == 1:
+            number = ValueConvert(item)
+            if number == "error":
+                return "error"
+            values.append(number)
+        elif len(parts) == 3 and IntegerPattern.fullmatch(parts[2]) is not None and int(parts[2]) > 0:
+            start = ValueConvert(parts[0])
+            stop = ValueConvert(parts[1])
+            if start == "error" or stop == "error":
+                return "error"
+            values += np.linspace(start, stop, int(parts[2])).tolist()
+        else:
+            return "error"
+    return np.array(values, dtype=float)
 
 
+def ToleranceValue(value):
+    # Function : ToleranceValue
+    # Reads the tolerance of a component in percent, with or without the % sign,
+    # for example "TOL=5%". Used by the monte carlo analysis (see MonteCarloNetlist).
+    # It has to be under 100%, as a component is given values from value*(1-tolerance)
+    # to value*(1+tolerance) and a value of 0 or less cant be simulated.
 
-    print("Invalid Test 14 for InputRead()")
-    Test=original.copy()
-    Test[22]="RL=-3"
-    error, _, _, _, _, _, _, _=InputRead(Test)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
+    # Input : [value : String]
+    # Output: [float] - as a fraction, or "error" if it isnt a number from 0 up to 100
+    """
 
+        >>> ToleranceValue("5%")
+        0.05
+        >>> ToleranceValue("-1")
+        'error'
+        >>> ToleranceValue("100%")
+        'error'
 
-    print("Invalid Test 15 for InputRead()")
-    Test=original.copy()
-    Test[23]="Fstart=100sr"
-    error, _, _, _, _, _, _, _=InputRead(Test)
+    """
+    if value.endswith("%"):
+        value = value[:-1]
+    tolerance = ValueConvert(value)
+    if tolerance == "error" or not 0 <= tolerance < 100:
+        return "error"
+    return tolerance/100
+
+
+class phaseProfile:
+    # phaseProfile - type: Class
+    # Description: Records the wall clock and CPU time spent in each phase of a run
+    # and how many times each phase ran, along with counts of the work done
+    # (frequency points, ABCD products ...). --profile saves it as JSON next to the output.
+    # With memory=True (--memory) it also uses tracemalloc to record, for each phase, the
+    # peak memory allocated while it ran, the memory still held when it finished and
+    # the lines of code holding the most memory at that point.
+
+    def __init__(self, memory=False):
+        self.phases = {}
+        self.counts = {}
+        self.started = {}
+        self.memory = {}
+        self.tracking = memory
+        self.memoryStart = {}
+        self.peakSeen = {}
+
+    def start(self, name):
+        # Method: start - starts timing a phase
+        # Input: [name : String]
+        if self.tracking:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            #The peak is reset for this phase, so the phases already running keep
+            # the highest value seen so far first.
+            for running in self.peakSeen:
+                self.peakSeen[running] = max(self.peakSeen[running], peak)
+            tracemalloc.reset_peak()
+            self.memoryStart[name] = current
+            self.peakSeen[name] = current
+        self.started[name] = (time.perf_counter(), time.process_time())
+
+    def stop(self, name, calls=1):
+        # Method: stop - stops timing a phase and adds the time to its total
+        # Input: [name : String], [calls : Integer] - 0 if the phase didnt actually run
+        wall, cpu = self.started.pop(name)
+        phase = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+        phase["wall"] += time.perf_counter()-wall
+        phase["cpu"] += time.process_time()-cpu
+        phase["calls"] += calls
+        if self.tracking:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            for running in self.peakSeen:
+                self.peakSeen[running] = max(self.peakSeen[running], peak)
+            start = self.memoryStart.pop(name)
+            usage = self.memory.setdefault(name, {"peak": 0, "retained": 0, "top": []})
+            usage["peak"] = max(usage["peak"], self.peakSeen.pop(name)-start)
+            usage["retained"] += current-start
+            #The lines of code that allocated the memory still held at the end of the phase
+            usage["top"] = [{"site": "%s:%d" % (statistic.traceback[0].filename, statistic.traceback[0].lineno),
+                             "size": statistic.size, "blocks": statistic.count}
+                            for statistic in tracemalloc.take_snapshot().statistics("lineno")[:10]]
+
+    def count(self, name, amount=1):
+        # Method: count - adds to one of the work counts
+        # Input: [name : String], [amount : Integer]
+        self.counts[name] = self.counts.get(name, 0)+int(amount)
+
+    def save(self, fileName, Details={}):
+        # Method: save - writes the phases and counts to a JSON file
+        # Input: [fileName : String], [Details : Dictionary] - anything else to save with them
+        import json
+        Report = dict(Details)
+        Report["phases"] = self.phases
+        Report["counts"] = self.counts
+        profilefile = open(fileName, "w")
+        json.dump(Report, profilefile, indent=2)
+        profilefile.close()
+
+    def saveMemory(self, fileName, Details={}):
+        # Method: saveMemory - writes the memory used by each phase to a JSON file,
+        # sizes are in bytes
+        # Input: [fileName : String], [Details : Dictionary] - anything else to save with them
+        import json
+        Report = dict(Details)
+        Report["phases"] = self.memory
+        memoryfile = open(fileName, "w")
+        json.dump(Report, memoryfile, indent=2)
+        memoryfile.close()
+
+class netlistCache:
+    # netlistCache - type: Class
+    # Description: On disk cache of loaded netlists (the sorted and folded circuit,
+    # the terms, the frequencies and the output order), so a netlist that hasnt
+    # changed isnt read and sorted again on the next run. Each netlist is saved to
+    # its own file, named by a hash of the netlist text, the fourier flag and the
+    # source of this program, so changing any of them loads the netlist again.
+    # The files hold only JSON and plain arrays in the layout of a compiled netlist
+    # (see WriteArrays), never pickles, so reading a file someone else put in the
+    # folder cant run any code; the worst it can do is give wrong results.
+    # Netlists loaded without folding (for the monte carlo analysis) are saved seperately.
+    # Once the folder holds more than maxBytes, the least recently used files are removed.
+
+    def __init__(self, folder, maxBytes=512*2**20):
+        self.folder = folder
+        self.maxBytes = maxBytes
+        self.version = None
+
+    def key(self, FileLines, Fourier=False, Fold=True):
+        # Method: key - the name of the file a netlist is saved in
+        # Input: [FileLines : String List], [Fourier : boolean], [Fold : boolean]
+        # Output: [String]
+        import hashlib
+        if self.version is None:
+            sourcefile = open(os.path.abspath(__file__), "rb")
+            self.version = hashlib.sha256(sourcefile.read()).hexdigest()
+            sourcefile.close()
+        digest = hashlib.sha256(self.version.encode())
+        digest.update(b"fourier\n" if Fourier else b"linear\n")
+        if not Fold:
+            digest.update(b"unfolded\n")
+        digest.update("\n".join(FileLines).encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()+".cache"
+
+    def load(self, key):
+        # Method: load - reads a saved netlist and marks it as recently used
+        # Input: [key : String]
+        # Output: [Netlist : Dictionary] - None if it isnt saved or cant be read
+        path = os.path.join(self.folder, key)
+        try:
+            error, Header, Arrays = CompiledArrays(path, False)
+            if error:
+                return None
+            Netlist = NetlistFromArrays(Header, Arrays)
+            os.utime(path)
+        except Exception:
+            return None
+        return Netlist
+
+    def save(self, key, Netlist):
+        # Method: save - saves a netlist then removes old files if the cache is too big.
+        # It is written to a temporary file first, so other processes never read half of it.
+        # Input: [key : String], [Netlist : Dictionary]
+        import tempfile
+        Header, Arrays = NetlistArrays(Netlist)
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            handle, tempName = tempfile.mkstemp(suffix=".tmp", dir=self.folder)
+            try:
+                cachefile = os.fdopen(handle, "wb")
+                WriteArrays(cachefile, Header, Arrays)
+                cachefile.close()
+                os.replace(tempName, os.path.join(self.folder, key))
+            except:
+                os.remove(tempName)
+                raise
+        except (OSError, TypeError, ValueError):
+            #Not being able to save only means the netlist is loaded again next time
+            return
+        self.evict()
+
+    def evict(self):
+        # Method: evict - removes the least recently used files until the cache fits in maxBytes
+        Files = []
+        for name in os.listdir(self.folder):
+            if name.endswith(".cache"):
+                path = os.path.join(self.folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                Files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in Files)
+        for _, size, path in sorted(Files):
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+def NetlistCache(Options):
+    # Function : NetlistCache
+    # The cache asked for on the command line: --cache uses the folder ".netcache",
+    # --cache=folder another folder, and --cache-size=MB limits its size (512 MB by default).
+    # Inputs: [Options : String List]
+    # Output: [error : boolean] - True if --cache-size isnt a number of MB above 0,
+    #   [Cache : netlistCache] - None if no cache was asked for
+    try:
+        maxBytes = int(float(OptionValue(Options, "--cache-size", 512))*2**20)
+    except (ValueError, OverflowError):
+        maxBytes = 0
+    if maxBytes <= 0:
+        return True, None
+    folder = OptionValue(Options, "--cache", None)
+    if folder is None and "--cache" in Options:
+        folder = ".netcache"
+    if folder is None:
+        return False, None
+    return False, netlistCache(folder, maxBytes)
+
+def NetlistLines(netlist):
+    # Function : NetlistLines
+    # The lines of a netlist without the new lines.
+    # Inputs: [netlist : String or String List] - file name, text or lines of a netlist
+    # Output: [FileLines : String List]
+    if isinstance(netlist, str) and "\n" not in netlist and "<CIRCUIT>" not in netlist:
+        FileLines = []
+        filee = open(netlist, "r")
+        for linex in filee:
+            FileLines.append(linex.replace("\n", ""))
+        filee.close()
+        return FileLines
+    if isinstance(netlist, str):
+        return netlist.split("\n")
+    return list(netlist)
+
+def TerminationGrid(RSval, RLval, Source):
+    # Function : TerminationGrid
+    # Termination sweep: when the <TERMS> block lists more than one source resistance,
+    # load or source value, the circuit is simulated with every combination of them.
+    # The cascade doesnt depend on the terminations, so it is still only worked out
+    # once per frequency and the outputs are calculated for all the combinations together.
+    # Inputs: [RSval : float or float array], [RLval : float or float array],
+    #   [Source : float or float array]
+    # Output: [RSval], [RLval], [Source] - floats if there is only one combination,
+    #   otherwise arrays with one entry per combination (source resistance first,
+    #   then the load, then the source)
+    if all(np.ndim(value) == 0 for value in [RSval, RLval, Source]):
+        return RSval, RLval, Source
+    grid = np.meshgrid(np.atleast_1d(RSval), np.atleast_1d(RLval), np.atleast_1d(Source), indexing="ij")
+    if grid[0].size == 1:
+        return [values.item() for values in grid]
+    return [values.ravel() for values in grid]
+
+def TerminationColumns(Netlist):
+    # Function : TerminationColumns
+    # The extra columns written before the outputs in a termination sweep, one row
+    # for each combination at each frequency. There are none for a normal netlist.
+    # Inputs: [Netlist : Dictionary]
+    # Output: [Columns : List of (name, unit, float array)]
+    if np.ndim(Netlist["RSval"]) == 0:
+        return []
+    source = ("VT", "V") if Netlist["Sourcetype"] == 1 else ("IN", "A")
+    return [("RS", "Ohms", Netlist["RSval"]), ("RL", "Ohms", Netlist["RLval"]),
+            (source[0], source[1], Netlist["Source"])]
+
+def ComponentTolerances(sortedCircuit):
+    # Function : ComponentTolerances
+    # The tolerance of each component, as a fraction, NaN where none was given.
+    # Inputs: [sortedCircuit : circuitBlock List]
+    # Output: [float array]
+    return np.array([np.nan if component.tol is None else component.tol for component in sortedCircuit], dtype=float)
+
+def LoadNetlist(netlist, Fourier=False, Profile=None, Cache=None, Fold=True):
+    # Function : LoadNetlist
+    # Reads a netlist, checks it and gets the circuit ready for the sweep.
+    # The netlist can be the name of a .net file, the text of one or a list of its lines,
+    # or the name of a compiled .cnet file (see CompileNetlist). With a Cache, a netlist that was loaded before is taken from the cache instead.
+    # Without Fold every component is kept as it is, with its tolerance in "Tolerances"
+    # (NaN where the netlist doesnt give one), for the monte carlo analysis.
+    # Inputs: [netlist : String or String List], [Fourier : boolean], [Profile : phaseProfile],
+    #   [Cache : netlistCache], [Fold : boolean]
+    # Output: [error : boolean], [Netlist : Dictionary] - the circuit (sorted and folded)
+    #   as a circuitTable only, the terms, the frequencies and the output order.
+    #   The circuitBlock objects are dropped once the table is built, as one object per
+    #   component takes far more memory (see NetlistChunks for the scalar engine).
+    if Profile is None:
+        Profile = phaseProfile()
+
+    #A compiled netlist is loaded as it is, without reading or sorting
+    if isinstance(netlist, str) and netlist.lower().endswith(".cnet"):
+        return LoadCompiled(netlist, Fourier, Profile, Fold)
+
+    #Reads all the file lines and removes the new lines
+    Profile.start("read")
+    FileLines = NetlistLines(netlist)
+    Profile.stop("read")
+    Profile.count("netlist lines", len(FileLines))
+
+    if Cache is not None:
+        Profile.start("cache load")
+        key = Cache.key(FileLines, Fourier, Fold)
+        Netlist = Cache.load(key)
+        Profile.stop("cache load")
+        if Netlist is not None:
+            Profile.count("cache hits", 1)
+            return False, Netlist
+
+    # Calls input read to retrive the interpreted input file
+    Profile.start("parse")
+    error, unsortedCircuit, Source, Sourcetype, RSval, RLval, Frequencies, OutputOrder = InputRead(FileLines, Fourier)
+    Profile.stop("parse")
     if error:
-        print("Passed")
-    else:
-        print("Failed")
+        return True, {}
+    RSval, RLval, Source = TerminationGrid(RSval, RLval, Source)
 
-
-    print("Invalid Test 16 for InputRead()")
-    Test=original.copy()
-    Test[24]="Fend=-123"
-    error, _, _, _, _, _, _, _=InputRead(Test)
+    #Sorts the unsorted list of circuit blocks and checks for any error occurance again.
+    Profile.start("sort")
+    error, sortedCircuit = NodeSorter(unsortedCircuit)
+    Profile.stop("sort")
     if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-
-
-    print("Invalid Test 17 for InputRead()")
-    Test=original.copy()
-    Test[25]="Nfreqs=1.2"
-    error, _, _, _, _, _, _, _=InputRead(Test)
+        return True, {}
+
+    #Multiplies out the frequency independent parts of the circuit before the sweep.
+    Profile.start("prepare")
+    foldedCircuit = FoldConstant(sortedCircuit) if Fold else sortedCircuit
+    Circuit = circuitTable(foldedCircuit)
+    Profile.stop("prepare")
+    Profile.count("components", len(sortedCircuit))
+    Profile.count("blocks after folding", len(foldedCircuit))
+    Profile.count("ABCD products folding", len(sortedCircuit)-len(foldedCircuit))
+
+    Netlist = {
+        "Circuit": Circuit,
+        "Source": Source,
+        "Sourcetype": Sourcetype,
+        "RSval": RSval,
+        "RLval": RLval,
+        "Frequencies": Frequencies,
+        "OutputOrder": OutputOrder
+    }
+    if not Fold:
+        Netlist["Tolerances"] = ComponentTolerances(sortedCircuit)
+    if Cache is not None:
+        Profile.start("cache save")
+        Cache.save(key, Netlist)
+        Profile.stop("cache save")
+    return False, Netlist
+
+#Compiled netlists (.cnet): the line "CNET 1", a line of JSON with the terms, the
+# outputs and where each array is, then the arrays themselves. Each array starts on
+# a 64 byte boundary, so they can all be memory mapped straight from the file.
+CompiledFormat = b"CNET 1\n"
+CompiledAlign = 64
+
+def CompiledStart(position):
+    return -(-position//CompiledAlign)*CompiledAlign
+
+def CompileNetlist(netlist, compiledName):
+    # Function : CompileNetlist
+    # Reads, checks and sorts a netlist once and saves it as a compiled .cnet file.
+    # This holds the circuit ready for the sweep (the arrays of a folded circuitTable)
+    # and the frequencies, so loading it needs no parsing or sorting. The sorted
+    # components and the lines of the <TERMS> block are kept too, for DecompileNetlist.
+    # Inputs: [netlist : String or String List], [compiledName : String]
+    # Output: [error : boolean]
+    import json
+    FileLines = NetlistLines(netlist)
+    #Fourier mode only adds the check that the frequencies arent logarithmic
+    logarithmic = False
+    error, unsortedCircuit, Source, Sourcetype, RSval, RLval, Frequencies, OutputOrder = InputRead(FileLines, True)
     if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-    print("Invalid Test 18 for InputRead()")
-    Test=original.copy()
-    Test[27]=""#no tag
-    error, _, _, _, _, _, _, _=InputRead(Test)
+        logarithmic = True
+        error, unsortedCircuit, Source, Sourcetype, RSval, RLval, Frequencies, OutputOrder = InputRead(FileLines)
     if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-
-
-
-
-    print("\nInvalid Tests for <OUTPUT> tag:\n")
-    print("Invalid Test 19 for InputRead()")
-    Test=original.copy()
-    Test[41]=""
-    error, _, _, _, _, _, _, _=InputRead(Test)
+        return True
+    error, sortedCircuit = NodeSorter(unsortedCircuit)
     if error:
-        print("Passed")
-    else:
-        print("Failed")
-
+        return True
+    RSval, RLval, Source = TerminationGrid(RSval, RLval, Source)
+
+    Arrays = {
+        "component n1": np.array([component.n1 for component in sortedCircuit], dtype=np.int64),
+        "component n2": np.array([component.n2 for component in sortedCircuit], dtype=np.int64),
+        "component type": np.array([component.type for component in sortedCircuit], dtype="S1"),
+        "component value": np.array([component.val for component in sortedCircuit], dtype=float),
+        "component tol": ComponentTolerances(sortedCircuit)
+    }
+    Circuit = circuitTable(FoldConstant(sortedCircuit))
+    for name in circuitTable.__slots__:
+        Arrays[name] = getattr(Circuit, name)
+    Arrays["Frequencies"] = np.asarray(Frequencies, dtype=float)
 
-    print("Invalid Test 20 for InputRead()")
-    Test=original.copy()
-    for i in range(31,41):
-        Test[i]=Test[i].upper()
-    error, _, _, _, _, _, _, _=InputRead(Test)
+    Terms = []
+    termsOpen = False
+    for line in FileLines:
+        word = line.partition("#")[0]
+        if word == "<TERMS>":
+            termsOpen = True
+        elif word == "</TERMS>":
+            termsOpen = False
+        elif termsOpen:
+            Terms.append(line)
+
+    Header = {
+        "Source": np.asarray(Source).tolist(),
+        "Sourcetype": Sourcetype,
+        "RSval": np.asarray(RSval).tolist(),
+        "RLval": np.asarray(RLval).tolist(),
+        "logarithmic": logarithmic,
+        "OutputOrder": OutputOrder,
+        "Terms": Terms
+    }
+    compiledfile = open(compiledName, "wb")
+    WriteArrays(compiledfile, Header, Arrays)
+    compiledfile.close()
+    return False
+
+def WriteArrays(outputfile, Header, Arrays):
+    # Function : WriteArrays
+    # Writes a header and arrays in the layout of a compiled netlist: the format line,
+    # the header as a line of JSON with where each array is, then the arrays.
+    # Nothing in it is ever run when it is read back (see CompiledArrays).
+    # Inputs: [outputfile : File] - open for writing bytes, [Header : Dictionary] - any JSON values,
+    #   "arrays" is added, [Arrays : Dictionary of arrays]
+    # Output: None
+    import json
+    Header["arrays"] = {}
+    position = 0
+    for name in Arrays:
+        position = CompiledStart(position)
+        Header["arrays"][name] = {"dtype": Arrays[name].dtype.str, "shape": list(Arrays[name].shape), "offset": position}
+        position += Arrays[name].nbytes
+
+    headerText = CompiledFormat+json.dumps(Header).encode()+b"\n"
+    start = CompiledStart(len(headerText))
+    outputfile.write(headerText)
+    for name in Arrays:
+        outputfile.seek(start+Header["arrays"][name]["offset"])
+        np.ascontiguousarray(Arrays[name]).tofile(outputfile)
+
+def CompiledArrays(compiledName, mapped=True):
+    # Function : CompiledArrays
+    # Opens a compiled netlist, memory mapping each of its arrays (read only),
+    # or reading them into memory if not mapped.
+    # Inputs: [compiledName : String], [mapped : boolean]
+    # Output: [error : boolean], [Header : Dictionary], [Arrays : Dictionary of arrays]
+    import json
+    compiledfile = open(compiledName, "rb")
+    if compiledfile.readline() != CompiledFormat:
+        compiledfile.close()
+        return True, {}, {}
+    Header = json.loads(compiledfile.readline())
+    start = CompiledStart(compiledfile.tell())
+    compiledfile.close()
+    Arrays = {}
+    for name, where in Header["arrays"].items():
+        shape = tuple(where["shape"])
+        if 0 in shape:
+            #An empty array cant be mapped
+            Arrays[name] = np.zeros(shape, dtype=where["dtype"])
+        elif not mapped:
+            Arrays[name] = np.fromfile(compiledName, dtype=where["dtype"], count=int(np.prod(shape)),
+                                       offset=start+where["offset"]).reshape(shape)
+        else:
+            Arrays[name] = np.memmap(compiledName, dtype=where["dtype"], mode="r",
+                                     offset=start+where["offset"], shape=shape)
+    return False, Header, Arrays
+
+def CompiledTolerances(Arrays):
+    #Files compiled before tolerances were saved have none
+    if "component tol" in Arrays:
+        return np.array(Arrays["component tol"])
+    return np.full(len(Arrays["component value"]), np.nan)
+
+def LoadCompiled(compiledName, Fourier=False, Profile=None, Fold=True):
+    # Function : LoadCompiled
+    # Loads a compiled netlist for the sweep. The arrays are memory mapped, so only
+    # the parts of the file the sweep reads are ever loaded into memory.
+    # Without Fold the circuit is built from the sorted components instead (see LoadNetlist).
+    # Inputs: [compiledName : String], [Fourier : boolean], [Profile : phaseProfile], [Fold : boolean]
+    # Output: [error : boolean], [Netlist : Dictionary] - as from LoadNetlist
+    if Profile is None:
+        Profile = phaseProfile()
+    Profile.start("read")
+    error, Header, Arrays = CompiledArrays(compiledName)
+    Profile.stop("read")
+    #Can not to fourier transform if the frequencies arent equally spaced.
+    if error or (Fourier == True and Header["logarithmic"]):
+        return True, {}
+    Profile.count("components", len(Arrays["component value"]))
+    Profile.count("blocks after folding", len(Arrays["value"]))
+
+    Netlist = NetlistFromArrays(Header, Arrays)
+    if not Fold:
+        Netlist["Circuit"] = circuitTable([circuitBlock(n1, n2, compName.decode(), compValue) for n1, n2, compName, compValue in zip(
+            Arrays["component n1"].tolist(), Arrays["component n2"].tolist(),
+            Arrays["component type"].tolist(), Arrays["component value"].tolist())])
+        Netlist["Tolerances"] = CompiledTolerances(Arrays)
+    return False, Netlist
+
+def NetlistArrays(Netlist):
+    # Function : NetlistArrays
+    # Splits a loaded netlist into a header of JSON values and its arrays, for WriteArrays.
+    # Inputs: [Netlist : Dictionary] (see LoadNetlist)
+    # Output: [Header : Dictionary], [Arrays : Dictionary of arrays]
+    Header = {
+        "Source": np.asarray(Netlist["Source"]).tolist(),
+        "Sourcetype": Netlist["Sourcetype"],
+        "RSval": np.asarray(Netlist["RSval"]).tolist(),
+        "RLval": np.asarray(Netlist["RLval"]).tolist(),
+        "OutputOrder": Netlist["OutputOrder"]
+    }
+    Arrays = {name: getattr(Netlist["Circuit"], name) for name in circuitTable.__slots__}
+    Arrays["Frequencies"] = np.asarray(Netlist["Frequencies"], dtype=float)
+    if "Tolerances" in Netlist:
+        Arrays["Tolerances"] = Netlist["Tolerances"]
+    return Header, Arrays
+
+def NetlistFromArrays(Header, Arrays):
+    # Function : NetlistFromArrays
+    # Puts a loaded netlist back together from a header and arrays (see NetlistArrays).
+    # Inputs: [Header : Dictionary], [Arrays : Dictionary of arrays]
+    # Output: [Netlist : Dictionary]
+    #The terminations of a termination sweep are saved as lists
+    for name in ["Source", "RSval", "RLval"]:
+        if isinstance(Header[name], list):
+            Header[name] = np.array(Header[name])
+    Netlist = {
+        "Circuit": circuitTable.fromArrays(Arrays),
+        "Source": Header["Source"],
+        "Sourcetype": Header["Sourcetype"],
+        "RSval": Header["RSval"],
+        "RLval": Header["RLval"],
+        "Frequencies": Arrays["Frequencies"],
+        "OutputOrder": Header["OutputOrder"]
+    }
+    if "Tolerances" in Arrays:
+        Netlist["Tolerances"] = Arrays["Tolerances"]
+    return Netlist
+
+def DecompileNetlist(compiledName):
+    # Function : DecompileNetlist
+    # Turns a compiled netlist back into the text of a netlist, with the components
+    # in sorted order. The values are written in full so they read back exactly.
+    # Inputs: [compiledName : String]
+    # Output: [error : boolean], [netlist : String]
+    error, Header, Arrays = CompiledArrays(compiledName)
     if error:
-        print("Passed")
-    else:
-        print("Failed")
-
-
-    print("Valid Tests for Node Sorter")
-
-    originalList=[]
-    originalList.append(circuitBlock(1, 2,"L",0))
-    originalList.append(circuitBlock(2, 0,"R",1))
-    originalList.append(circuitBlock(2, 0,"R",2))
-    originalList.append(circuitBlock(2, 3, "R",3))
-    originalList.append(circuitBlock(3, 4, "R",4))
-    originalList.append(circuitBlock(4, 0, "G",5))
-    originalList.append(circuitBlock(4, 0, "R",6))
-    originalList.append(circuitBlock(4, 0, "R",7))
-    originalList.append(circuitBlock(4, 0, "R",8))
-    originalList.append(circuitBlock(4, 5, "R",9))
-    originalList.append(circuitBlock(5, 0, "C",10))
-    originalList.append(circuitBlock(5, 6, "G",11))
-    originalList.append(circuitBlock(6, 7, "R",12))
-    originalList.append(circuitBlock(7, 8, "R",13))
-    originalList.append(circuitBlock(8, 9, "R",14))
-    originalList.append(circuitBlock(9, 0, "R",15))
-    originalList.append(circuitBlock(9, 0, "R",16))
-    originalList.append(circuitBlock(9, 0, "R",17))
-    originalList.append(circuitBlock(9, 0, "R",18))
-    originalList.append(circuitBlock(10, 11, "R",19))
-    
-
-    fail=False
-    shuffled=originalList.copy()
-    import random
-    for i in range(0,20):
-        random.shuffle(shuffled)
-        _,sort=NodeSorter(shuffled)
-        for indx,tst in enumerate(originalList):
-            if tst.n1 != sort[indx].n1: # Compares the first node
-                                        # to the original list first node
-                fail=True
-            if tst.n2 != sort[indx].n2: # Compares the second node
-                                        # to the original list second node
-                fail=True
-
-    if fail==True:
-        print("Failed")
-    else:
-        print("Passed")
+        return True, ""
+    lines = ["<CIRCUIT>"]
+    for n1, n2, compName, compValue, tolerance in zip(Arrays["component n1"].tolist(), Arrays["component n2"].tolist(),
+                                                      Arrays["component type"].tolist(), Arrays["component value"].tolist(),
+                                                      CompiledTolerances(Arrays).tolist()):
+        lines.append("n1=%d n2=%d %s=%r" % (n1, n2, compName.decode(), compValue))
+        #Tolerances are kept as fractions, 15 digits gives back the percentage as it was written
+        if tolerance == tolerance:
+            lines[-1] += " TOL=%.15g%%" % (tolerance*100)
+    lines += ["</CIRCUIT>", "<TERMS>"]+Header["Terms"]+["</TERMS>", "<OUTPUT>"]
+    lines += [name+" "+unit for name, unit in Header["OutputOrder"]]
+    lines.append("</OUTPUT>")
+    return False, "\n".join(lines)+"\n"
+
+def NetlistPlan(Netlist, Fourier=False, Options=[]):
+    # Function : NetlistPlan
+    # Works out how to run the sweep of a loaded netlist (see PlanExecution).
+    # Inputs: [Netlist : Dictionary], [Fourier : boolean], [Options : String List]
+    # Output: [Plan : Dictionary]
+    Frequencies = Netlist["Frequencies"]
+    return PlanExecution(len(Netlist["Circuit"]), len(Frequencies), len(Netlist["OutputOrder"]),
+                         Fourier == True and len(Frequencies)>1, Options, np.size(Netlist["RSval"]))
+
+def NetlistChunks(Netlist, Plan, Profile=None):
+    # Function : NetlistChunks
+    # Sweeps a loaded netlist a chunk of frequencies at a time (see SweepChunks).
+    # Only the outputs listed in the <OUTPUT> block are calculated.
+    # Inputs: [Netlist : Dictionary], [Plan : Dictionary], [Profile : phaseProfile]
+    # Output: generator of [FrequencyChunk : float array], [Values : Dictionary of complex arrays]
+    if Profile is None:
+        Profile = phaseProfile()
+    Names = [h[0] for h in Netlist["OutputOrder"]]
+    sortedCircuit = None
+    if Plan["engine"] == "scalar":
+        #Only the table is kept, the scalar engine needs the blocks
+        sortedCircuit = Netlist["Circuit"].blocks()
+    Chunks = SweepChunks(sortedCircuit, Netlist["Circuit"], Netlist["Frequencies"],
+                         Netlist["RSval"], Netlist["RLval"], Netlist["Source"], Netlist["Sourcetype"], Names, Plan)
+    while True:
+        #Only the time spent getting each chunk counts towards the sweep
+        Profile.start("sweep")
+        try:
+            FrequencyChunk, Values = next(Chunks)
+        except StopIteration:
+            Profile.stop("sweep", 0)
+            return
+        except Exception:
+            Profile.stop("sweep")
+            raise
+        Profile.stop("sweep")
+        #Every block after the first is one 2x2 ABCD product per frequency
+        Profile.count("frequency points", len(FrequencyChunk))
+        Profile.count("ABCD products", (len(Netlist["Circuit"])-1)*len(FrequencyChunk))
+        Profile.count("outputs calculated", len(Values)*len(FrequencyChunk))
+        yield FrequencyChunk, Values
+
+def SimulateNetlist(Netlist, Fourier=False, FourierCoeff=0, Plan=None, Profile=None):
+    # Function : SimulateNetlist
+    # Sweeps a loaded netlist over all of its frequencies and keeps the results in memory.
+    # Inputs: [Netlist : Dictionary], [Fourier : boolean], [FourierCoeff : Integer] - 2**FourierCoeff
+    #   time points, [Plan : Dictionary] - planned from the netlist if not given, [Profile : phaseProfile]
+    # Output: [error : boolean], [Result : Dictionary] (see simulate)
+    if Plan is None:
+        Plan = NetlistPlan(Netlist, Fourier)
+    if Profile is None:
+        Profile = phaseProfile()
+    Frequencies = Netlist["Frequencies"]
+    OutputOrder = Netlist["OutputOrder"]
+
+    try:
+        Chunks = [values for _, values in NetlistChunks(Netlist, Plan, Profile)]
+    except Exception:
+        return True, {}
+    Values = Chunks[0]
+    if len(Chunks) > 1:
+        Values = {name: np.concatenate([values[name] for values in Chunks]) for name in Values}
+
+    Result = {"Frequencies": Frequencies, "OutputOrder": OutputOrder, "Values": Values}
+    if np.ndim(Netlist["RSval"]) > 0:
+        Result["Terminations"] = TerminationColumns(Netlist)
+
+    #If in fourier mode: do the fourier transform (and if the amount of frequencies are 2 or more)
+    if Fourier == True and len(Frequencies)>1:
+        Profile.start("fourier")
+        #Calculate the time difference and create the time axis for the output
+        Td = 1/((Frequencies[1]-Frequencies[0]))
+        Result["Time"] = np.linspace(0, Td, 2**FourierCoeff)
+        #Perfrom the inverse fourier transform on each value
+        # going in order of the output order of variables
+        Result["Transforms"] = [np.fft.ifft(a=Values[h[0]], n=2**FourierCoeff, axis=0) for h in OutputOrder]
+        Profile.stop("fourier")
+        Profile.count("inverse fourier transforms", len(OutputOrder))
+    return False, Result
+
+def PercentileBand(values, Percentiles, logarithmic=False):
+    # Function : PercentileBand
+    # The percentiles over the samples (the first axis) of one output, as complex
+    # values that give the percentiles of what is written once they are converted
+    # to the output unit (see ValueConvert). For a unit in dB that is the magnitude
+    # and the phase, otherwise the real and imaginary parts.
+    # Inputs: [values : complex array (Nsamples x Nfreqs)], [Percentiles : float List],
+    #   [logarithmic : boolean] - True for an output in dB
+    # Output: [band : complex array (Nfreqs x Npercentiles)]
+    if logarithmic:
+        magnitude = np.percentile(np.abs(values), Percentiles, axis=0)
+        phase = np.percentile(np.angle(values), Percentiles, axis=0)
+        return (magnitude*np.exp(1j*phase)).T
+    return (np.percentile(values.real, Percentiles, axis=0)+1j*np.percentile(values.imag, Percentiles, axis=0)).T
+
+def MonteCarloOptions(Options):
+    # Function : MonteCarloOptions
+    # Reads and checks the options of the monte carlo analysis (see MonteCarloNetlist).
+    # Inputs: [Options : String List]
+    # Output: [message : String] - what is wrong with the options, "" if they are valid,
+    #   [Settings : Dictionary] - "samples", "tolerance", "seed" and "percentiles"
+    Settings = {}
+    try:
+        Settings["samples"] = int(OptionValue(Options, "--montecarlo", 0))
+    except ValueError:
+        Settings["samples"] = 0
+    if Settings["samples"] <= 0:
+        return "Invalid --montecarlo value: %s (a number of samples above 0)" % OptionValue(Options, "--montecarlo", ""), {}
+    Settings["tolerance"] = ToleranceValue(OptionValue(Options, "--tol", "0"))
+    if Settings["tolerance"] == "error":
+        return "Invalid --tol value: %s (a percentage from 0 up to 100)" % OptionValue(Options, "--tol", ""), {}
+    try:
+        Settings["seed"] = int(OptionValue(Options, "--seed", 0))
+    except ValueError:
+        Settings["seed"] = -1
+    if Settings["seed"] < 0:
+        return "Invalid --seed value: %s (a whole number of 0 or more)" % OptionValue(Options, "--seed", ""), {}
+    try:
+        Settings["percentiles"] = [float(value) for value in OptionValue(Options, "--percentiles", "5,50,95").split(",")]
+    except ValueError:
+        Settings["percentiles"] = [-1]
+    if not all(0 <= value <= 100 for value in Settings["percentiles"]):
+        return "Invalid --percentiles value: %s (numbers from 0 to 100 seperated by commas)" % OptionValue(Options, "--percentiles", ""), {}
+    return "", Settings
+
+def MonteCarloPlan(Netlist, Settings):
+    # Function : MonteCarloPlan
+    # The plan of a monte carlo analysis, in the same form as PlanExecution for --dry-run
+    # and --profile. Each sample at each frequency of a chunk holds A, B, C and D, the
+    # requested outputs and about two temporaries, all complex (16 bytes each).
+    # Inputs: [Netlist : Dictionary] - loaded without folding, [Settings : Dictionary] (see MonteCarloOptions)
+    # Output: [Plan : Dictionary]
+    Nfreqs = len(Netlist["Frequencies"])
+    Ncomponents = len(Netlist["Circuit"])
+    Noutputs = len(Netlist["OutputOrder"])
+    chunk = max(1, min(Nfreqs, MonteCarloPoints//Settings["samples"]))
+    return {
+        "engine": "montecarlo",
+        "components": Ncomponents,
+        "frequencies": Nfreqs,
+        "outputs": Noutputs,
+        "samples": Settings["samples"],
+        "percentiles": len(Settings["percentiles"]),
+        "work": Settings["samples"]*Ncomponents*Nfreqs,
+        "chunk": chunk,
+        "chunks": -(-Nfreqs//chunk),
+        "memory": Settings["samples"]*(8*Ncomponents+16*(6+Noutputs)*chunk)
+    }
 
-    
-    shuffled.append(circuitBlock(5, 6, "G",11))
-    error,_=NodeSorter(shuffled)
-    if error:
-        print("Passed")
-    else:
-        print("Failed")
-    shuffled.pop()
-    
-    shuffled.append(circuitBlock(-3, 3, "C",23))
-    error,_=NodeSorter(shuffled)
+def MonteCarloNetlist(Netlist, Options=[], Profile=None):
+    # Function : MonteCarloNetlist
+    # Monte carlo tolerance analysis of a netlist loaded without folding (see LoadNetlist).
+    # --montecarlo=N sweeps N samples of the circuit, with each component value drawn
+    # uniformly within its tolerance: TOL=5% on its line in the <CIRCUIT> block, or
+    # --tol=5% for every component without one (0 by default). --seed=S picks the
+    # random numbers (0 by default), so the same seed gives the same samples.
+    # Every sample is swept at once (see MonteCarloSweep) a chunk of frequencies at a
+    # time, and only the percentiles of each output over the samples are kept,
+    # the 5th, 50th and 95th unless --percentiles=1,50,99 is given.
+    # Not possible with a termination sweep. Invalid options give an error (see MonteCarloOptions).
+    # Inputs: [Netlist : Dictionary], [Options : String List], [Profile : phaseProfile]
+    # Output: [error : boolean], [Result : Dictionary] (see simulate)
+    if Profile is None:
+        Profile = phaseProfile()
+    message, Settings = MonteCarloOptions(Options)
+    if message != "" or np.ndim(Netlist["RSval"]) > 0:
+        return True, {}
+    Nsamples = Settings["samples"]
+    Percentiles = Settings["percentiles"]
+    Circuit = Netlist["Circuit"]
+    Frequencies = Netlist["Frequencies"]
+    OutputOrder = Netlist["OutputOrder"]
+    Names = [h[0] for h in OutputOrder]
+
+    Profile.start("montecarlo")
+    Tolerances = np.where(np.isnan(Netlist["Tolerances"]), Settings["tolerance"], Netlist["Tolerances"])
+    generator = np.random.default_rng(Settings["seed"])
+    Samples = Circuit.value*(1+Tolerances*generator.uniform(-1, 1, (Nsamples, len(Circuit))))
+    chunk = max(1, MonteCarloPoints//Nsamples)
+    Bands = [[] for h in OutputOrder]
+    for start in range(0, len(Frequencies), chunk):
+        Values = MonteCarloSweep(Circuit, Samples, Frequencies[start:start+chunk], Netlist["RSval"],
+                                 Netlist["RLval"], Netlist["Source"], Netlist["Sourcetype"], Names)
+        for band, h in zip(Bands, OutputOrder):
+            band.append(PercentileBand(Values[h[0]], Percentiles, "dB" in h[1]))
+    Profile.stop("montecarlo")
+    Profile.count("monte carlo samples", Nsamples)
+    Profile.count("ABCD products", Nsamples*len(Circuit)*len(Frequencies))
+
+    Result = {
+        "Frequencies": Frequencies,
+        "OutputOrder": OutputOrder,
+        "Percentiles": np.array(Percentiles),
+        "Bands": [np.concatenate(band) for band in Bands]
+    }
+    return False, Result
+
+def simulate(netlist, Fourier=False, FourierCoeff=0, Options=[]):
+    # Function : simulate
+    # Runs a whole simulation and gives back the results without writing any files,
+    # so it can be used from other Python programs:
+    #     import Main
+    #     error, Result = Main.simulate("TESTFILES/b_CR.net")
+    #     Result["Values"]["Vout"]  ->  complex array, one value per frequency
+    # Inputs: [netlist : String or String List] - file name, text or lines of a netlist,
+    #   [Fourier : boolean], [FourierCoeff : Integer],
+    #   [Options : String List] - the same "--" options as the command line
+    # Output: [error : boolean], [Result : Dictionary] with
+    #   "Frequencies" : float array, "OutputOrder" : String 2D List,
+    #   "Values" : Dictionary of complex arrays, one per requested output,
+    #   and in fourier mode "Time" : float array, "Transforms" : complex array List.
+    #   In a termination sweep (see TerminationGrid) the values have a column for each
+    #   combination of terminations, listed in "Terminations" : List of (name, unit, float array)
+    #   With --montecarlo (see MonteCarloNetlist) there are no "Values", but
+    #   "Percentiles" : float array and "Bands" : complex array List, one for each output
+    #   in the output order with a column for each percentile.
+    error, Cache = NetlistCache(Options)
     if error:
-        print("Passed")
-    else:
-        print("Failed")
-    shuffled.pop()
-
-    shuffled.append(circuitBlock(3, 3, "C",23))
-    error,_=NodeSorter(shuffled)
+        return True, {}
+    if OptionValue(Options, "--montecarlo", None) is not None:
+        error, Netlist = LoadNetlist(netlist, Fourier, None, Cache, False)
+        if error or Fourier:
+            return True, {}
+        return MonteCarloNetlist(Netlist, Options)
+    error, Netlist = LoadNetlist(netlist, Fourier, None, Cache)
     if error:
-        print("Passed")
+        return True, {}
+    return SimulateNetlist(Netlist, Fourier, FourierCoeff, NetlistPlan(Netlist, Fourier, Options))
+
+def WriteResult(outputfile, Result, Profile=None):
+    # Function : WriteResult
+    # Formats the results of a simulation and writes them to an open output file.
+    # Inputs: [outputfile : File], [Result : Dictionary] (see simulate), [Profile : phaseProfile]
+    # Output: None
+    if Profile is None:
+        Profile = phaseProfile()
+    OutputOrder = Result["OutputOrder"]
+    Leading = Result.get("Terminations", [])
+    Profile.start("format")
+    if "Bands" in Result:
+        #A row for each percentile of each frequency
+        Leading = [("Pct", "%", Result["Percentiles"])]
+        line1, line2 = OutputTitles(OutputOrder, False, Leading)
+        outputValueLine = OutputRows(Result["Frequencies"], Result["Bands"], OutputOrder, False, Leading)
+    elif "Transforms" in Result:
+        #Formatting the titles, the units and the fourier transforms
+        line1, line2 = OutputTitles(OutputOrder, True, Leading)
+        outputValueLine = OutputRows(Result["Time"], Result["Transforms"], OutputOrder, True, Leading)
     else:
-        print("Failed")
-    shuffled.pop()
-
-    shuffled.append(circuitBlock(1, 1, "C",23))
-    error,_=NodeSorter(shuffled)
+        #Formatting the output for a normal output
+        #Uses a predefined output value width and puts everything in scientific notation.
+        line1, line2 = OutputTitles(OutputOrder, False, Leading)
+        outputValueLine = OutputRows(Result["Frequencies"], [Result["Values"][h[0]] for h in OutputOrder], OutputOrder, False, Leading)
+    Profile.stop("format")
+    Profile.count("rows written", len(outputValueLine))
+
+    #Writing everythin to the output file and appending new lines.
+    Profile.start("write")
+    outputfile.write(line1+"\n")
+    outputfile.write(line2+"\n")
+    outputfile.write("".join(wordsad+"\n" for wordsad in outputValueLine))
+    Profile.stop("write")
+
+def StreamResult(outputfile, Netlist, Plan, Profile=None):
+    # Function : StreamResult
+    # Streaming mode: the sweep is done a chunk of frequencies at a time and each chunk
+    # is written to the file straight away, so the memory used doesnt grow with the
+    # number of frequencies. Not possible for a fourier transform as it needs every frequency.
+    # If the sweep or the writing fails part way the error is printed and the rows
+    # already written are removed, so the output file is left blank as for any other error.
+    # Inputs: [outputfile : File], [Netlist : Dictionary], [Plan : Dictionary], [Profile : phaseProfile]
+    # Output: [error : boolean]
+    if Profile is None:
+        Profile = phaseProfile()
+    OutputOrder = Netlist["OutputOrder"]
+    Leading = TerminationColumns(Netlist)
+    line1, line2 = OutputTitles(OutputOrder, False, Leading)
+    outputfile.write(line1+"\n")
+    outputfile.write(line2+"\n")
+    outputfile.flush()
+    try:
+        for FrequencyChunk, Values in NetlistChunks(Netlist, Plan, Profile):
+            Profile.start("format")
+            outputValueLine = OutputRows(FrequencyChunk, [Values[h[0]] for h in OutputOrder], OutputOrder, False, Leading)
+            Profile.stop("format")
+            Profile.count("rows written", len(outputValueLine))
+            Profile.start("write")
+            outputfile.write("".join(wordsad+"\n" for wordsad in outputValueLine))
+            outputfile.flush()
+            Profile.stop("write")
+    except (ValueError, ArithmeticError, MemoryError, OSError) as problem:
+        print("Streamed output stopped (%s: %s)" % (type(problem).__name__, problem))
+        outputfile.seek(0)
+        outputfile.truncate()
+        return True
+    return False
+
+def Run(inputName, outputName, Fourier=False, FourierCoeff=0, Options=[]):
+    # Function : Run
+    # Simulates a netlist file and writes the results to the output file.
+    # The output file is left blank if the netlist is invalid. --dry-run only
+    # prints the plan (engine, chunk size, streaming and threads) and writes nothing.
+    # --profile also saves the time spent in each phase and counts of the work done
+    # to outputName+".profile.json", and --memory saves the memory used by each phase
+    # to outputName+".memory.json" (this makes the run a few times slower).
+    # --cache keeps the loaded netlist on disk for the next run (see NetlistCache).
+    # --montecarlo=N writes percentiles of the outputs over N samples of the component
+    # values instead (see MonteCarloNetlist), not in fourier mode. With --dry-run it
+    # prints the plan of the monte carlo analysis (see MonteCarloPlan).
+    # Inputs: [inputName : String], [outputName : String], [Fourier : boolean],
+    #   [FourierCoeff : Integer], [Options : String List]
+    # Output: [error : boolean]
+    error, Cache = NetlistCache(Options)
     if error:
-        print("Passed")
-    else:
-        print("Failed")
-    shuffled.pop()
-
-    print("\nStarting ValueConvert() Valid Tests")
-
-    if ValueConvert("3k") == 3000:
-        print("Passed")
-    else:
-        print("Fail")
-    
-    if ValueConvert("3u") == 3e-6:
-        print("Passed")
-    else:
-        print("Fail")
-    
-    if ValueConvert("1.234567M") == 1234567:
-        print("Passed")
-    else:
-        print("Fail")
-    
-    if ValueConvert("0p") == 0:
-        print("Passed")
-    else:
-        print("Fail")
-    
-    if ValueConvert("500") == 500:
-        print("Passed")
-    else:
-        print("Fail")
-    
-    if ValueConvert("3e-3m") == 3e-6:
-        print("Passed")
-    else:
-        print("Fail")
-
-    
-    if ValueConvert("3e-3 m") == 3e-6:
-        print("Passed")
-    else:
-        print("Fail")
-    
-    if ValueConvert("0.0001 M") == 1000:
-        print("Passed")
-    else:
-        print("Fail")
-    
-    print("ValueConvert() invalid cases")
-
-
-    if ValueConvert("10uu") == "error":
-        print("Passed")
-    else:
-        print("Fail")
-
-    if ValueConvert("10uk") == "error":
-        print("Passed")
-    else:
-        print("Fail")
-
-
-    if ValueConvert("106K") == "error":
-        print("Passed")
-    else:
-        print("Fail")
-
-
-    if ValueConvert("ten k") == "error":
-        print("Passed")
-    else:
-        print("Fail")
-
-
-    if ValueConvert("1k.1") == "error":
-        print("Passed")
-    else:
-        print("Fail")
-        
-    if ValueConvert("10 1k") == "error":
-        print("Passed")
-    else:
-        print("Fail")
-    
-    
-    print("\nStarting ValueConvert() Valid Tests for output side:")
-    
-    
-    if ValueConvert(3,"V","Vin") == (3,0):
-        print("Passed")
-    else:
-        print("Fail")
-
+        print("Invalid --cache-size value: %s (a size in MB above 0)" % OptionValue(Options, "--cache-size", ""))
+        return True
+
+    #The monte carlo options are checked before anything is run
+    MonteCarlo = OptionValue(Options, "--montecarlo", None) is not None
+    if MonteCarlo:
+        message, Settings = MonteCarloOptions(Options)
+        if message == "" and Fourier:
+            message = "--montecarlo cant be used in fourier mode"
+        if message != "":
+            print(message)
+            return True
+
+    if "--dry-run" in Options:
+        error, Netlist = LoadNetlist(inputName, Fourier, None, Cache, not MonteCarlo)
+        if error:
+            return True
+        if not MonteCarlo:
+            PrintPlan(NetlistPlan(Netlist, Fourier, Options))
+        elif np.ndim(Netlist["RSval"]) > 0:
+            print("--montecarlo cant be used with a termination sweep")
+            return True
+        else:
+            PrintPlan(MonteCarloPlan(Netlist, Settings))
+        return False
+
+    if "--memory" in Options:
+        import tracemalloc
+        tracemalloc.start()
+    Profile = phaseProfile("--memory" in Options)
+    Profile.start("total")
+    Plan = {}
+    error = True
+    outputfile = open(outputName, "w")
+    try:
+        if MonteCarlo:
+            error, Netlist = LoadNetlist(inputName, Fourier, Profile, Cache, False)
+            if error:
+                return True
+            if np.ndim(Netlist["RSval"]) > 0:
+                print("--montecarlo cant be used with a termination sweep")
+                error = True
+                return True
+            Plan = MonteCarloPlan(Netlist, Settings)
+            error, Result = MonteCarloNetlist(Netlist, Options, Profile)
+            if error:
+                return True
+            WriteResult(outputfile, Result, Profile)
+            return False
+        error, Netlist = LoadNetlist(inputName, Fourier, Profile, Cache)
+        if error:
+            return True
+        Plan = NetlistPlan(Netlist, Fourier, Options)
+        if Plan["stream"]:
+            error = StreamResult(outputfile, Netlist, Plan, Profile)
+            return error
+        error, Result = SimulateNetlist(Netlist, Fourier, FourierCoeff, Plan, Profile)
+        if error:
+            return True
+        WriteResult(outputfile, Result, Profile)
+    except ValueError:
+        #An invalid output unit, the output file is left blank
+        error = True
+        return True
+    finally:
+        outputfile.close()
+        Profile.stop("total")
+        Details = {"input": inputName, "output": outputName, "error": error, "plan": Plan}
+        if "--profile" in Options:
+            Profile.save(outputName+".profile.json", Details)
+        if "--memory" in Options:
+            tracemalloc.stop()
+            Profile.saveMemory(outputName+".memory.json", Details)
+    return False
+
+def BatchJobs(Arguments, outputFolder=None):
+    # Function : BatchJobs
+    # Works out the list of netlists for batch mode. Each argument can be a .net (or .cnet) file,
+    # a glob pattern such as "TESTFILES/*.net", or a manifest: a text file listing one
+    # netlist per line, optionally followed by its output file name. Blank lines and
+    # lines starting with "#" in a manifest are skipped, and paths in it are relative
+    # to the manifest. Without an output name the output goes next to the netlist
+    # (or in outputFolder) with the .net replaced by .csv.
+    # A manifest that cant be read, or a pattern that matches nothing, is reported
+    # and left out, so the rest of the batch still runs.
+    # Inputs: [Arguments : String List], [outputFolder : String]
+    # Output: [error : boolean] - True if any argument was left out,
+    #   [Jobs : List of (inputName, outputName)]
+    import glob
+
+    def outputFor(inputName):
+        outputName = os.path.splitext(inputName)[0]+".csv"
+        if outputFolder is not None:
+            outputName = os.path.join(outputFolder, os.path.basename(outputName))
+        return outputName
 
-    if (ValueConvert(1,"dB","Vin")) == (0,0):
-        print("Passed")
-    else:
-        print("Fail")
-    if (ValueConvert(100,"dBu","Vin")) == (160.0,0.0):
-        print("Passed")
-    else:
-        print("Fail")
-    if (ValueConvert(1000,"dBm","Vin")) == (120.0, 0.0):
-        print("Passed")
-    else:
-        print("Fail")
-    if (ValueConvert(100j,"dB","Pin")) == (20.0, 1.5707963267948966):
-        print("Passed")
-    else:
-        print("Fail")
-    if (ValueConvert(25+25j,"dB","Pout")) == (15.484550065040281, 0.7853981633974483):
-        print("Passed")
-    else:
-        print("Fail")
-    if (ValueConvert(25+25j,"kV","Iout")) == (0.025, 0.025):
-        print("Passed")
-    else:
-        print("Fail")
-    if (ValueConvert(20+30j,"dBK","Zin")) == (31.13943352306837, 0.982793723247329):
-        print("Passed")
-    else:
-        print("Fail")
-    if (ValueConvert(2500+25j,"mOhms","Zout")) == (2500000.0, 25000.0):
-        print("Passed")
+    error = False
+    Jobs = []
+    for argument in Arguments:
+        if glob.has_magic(argument):
+            names = sorted(glob.glob(argument))
+            if len(names) == 0:
+                print("ERROR (no files match) %s" % argument)
+                error = True
+            Jobs += [(name, outputFor(name)) for name in names]
+        elif argument.lower().endswith((".net", ".cnet")):
+            Jobs.append((argument, outputFor(argument)))
+        else:
+            manifestFolder = os.path.dirname(argument)
+            try:
+                manifest = open(argument, "r")
+            except OSError as problem:
+                print("ERROR (%s) %s" % (problem.strerror, argument))
+                error = True
+                continue
+            for line in manifest:
+                words = line.split()
+                if len(words) == 0 or words[0].startswith("#"):
+                    continue
+                inputName = os.path.join(manifestFolder, words[0])
+                if len(words) > 1:
+                    Jobs.append((inputName, os.path.join(manifestFolder, words[1])))
+                else:
+                    Jobs.append((inputName, outputFor(inputName)))
+            manifest.close()
+    return error, Jobs
+
+def BatchJob(Job):
+    # Function : BatchJob
+    # Runs one netlist of a batch and times it. Kept as a separate function so it
+    # can be sent to the worker processes of a parallel batch. Any exception is caught
+    # and reported in the status, so one bad netlist doesnt stop the rest of the batch.
+    # Inputs: [Job : Tuple] - (inputName, outputName, Fourier, FourierCoeff, Options)
+    # Output: [error : boolean], [status : String], [seconds : float]
+    inputName, outputName, Fourier, FourierCoeff, Options = Job
+    start = time.perf_counter()
+    try:
+        error = Run(inputName, outputName, Fourier, FourierCoeff, Options)
+        status = "ERROR" if error else "OK"
+    except OSError as problem:
+        error = True
+        status = "ERROR (%s)" % problem.strerror
+    except Exception as problem:
+        error = True
+        status = "ERROR (%s: %s)" % (type(problem).__name__, problem)
+    return error, status, time.perf_counter()-start
+
+def RunBatch(Jobs, Fourier=False, FourierCoeff=0, Options=[], Processes=1):
+    # Function : RunBatch
+    # Batch mode: simulates every netlist in one process, so Python, numpy and
+    # everything else is only loaded once. With more than one process the netlists
+    # are shared out between a pool of worker processes, one per CPU core.
+    # The summary lines are always printed in the same order as the netlists,
+    # followed by a total and the throughput.
+    # Inputs: [Jobs : List of (inputName, outputName)], [Fourier : boolean],
+    #   [FourierCoeff : Integer], [Options : String List], [Processes : Integer]
+    # Output: [errors : Integer] - the number of netlists that failed
+    batchStart = time.perf_counter()
+    Processes = max(1, min(Processes, len(Jobs)))
+    if Processes > 1 and OptionValue(Options, "--workers", None) is None:
+        #The cores are already busy with other netlists, so each sweep uses one thread
+        Options = Options+["--workers=1"]
+    Work = [(inputName, outputName, Fourier, FourierCoeff, Options) for inputName, outputName in Jobs]
+
+    if Processes == 1:
+        Results = map(BatchJob, Work)
     else:
-        print("Fail")
-
-
-   
-
-
-
+        import concurrent.futures
+        executor = concurrent.futures.ProcessPoolExecutor(Processes)
+        #Small netlists are sent in groups so the cost of sending them is shared
+        Results = executor.map(BatchJob, Work, chunksize=max(1, min(64, len(Work)//(4*Processes))))
+
+    errors = 0
+    try:
+        for (inputName, outputName), (error, status, seconds) in zip(Jobs, Results):
+            errors += error
+            print("%-5s %s -> %s  %.3f s" % (status, inputName, outputName, seconds))
+    finally:
+        if Processes > 1:
+            executor.shutdown()
+    seconds = time.perf_counter()-batchStart
+    print("%d netlists, %d OK, %d errors, %.3f s, %.1f netlists/s" % (len(Jobs), len(Jobs)-errors, errors, seconds, len(Jobs)/max(seconds, 1e-9)))
+    return errors
 
+                            ################################
+                                #   START OF PROGRAM    #
+                            ################################
 
-#Checking File Arguments: This section of the code differentiates each part
+#Command line: This section of the code differentiates each part
 # of the command line and uses selective statements to determine whether the user
 # wants to perform a fourier analysis or a normal analysis. With that information
 # the program saves the relevant information for file naming and saving.
-
-Fourier = False
-
-if len(sys.argv) > 2:
-    if str(sys.argv[1]) == "-i" and len(sys.argv) > 4:
-        if str(sys.argv[3]) == "-t":
-            Fourier = True
-            inputName = sys.argv[2]+".net"
-            outputName = sys.argv[2]+".csv"
-            FourierCoeff = int(sys.argv[4])
-    else:
-        inputName = sys.argv[1]
-        outputName = sys.argv[2]
-
-
-#Test Mode
-if len(sys.argv)>1:
-    if str(sys.argv[1]) == "Test":
-        import doctest
-        doctest.testmod()
-        Testing()
-
-
-
-#Checks if the input and the output file names have been declared.
-#And closes the file if there is no input file
-
-
-if "inputName" not in locals():
-    print("No Input File")
-    exit()
-if "outputName" not in locals():
-    outputName == "test.csv"
-
-#opens the output file
-outputfile = open(outputName, "w")
-#Reads all the file lines, removes the new lines
-# and stores it in the FileLines variable
-FileLines = []
-filee = open(inputName, "r")
-for linex in filee:
-    FileLines.append(linex.replace("\n", ""))
-filee.close()
-
-# Calls input read to retrive the interpreted input file
-# Checks if any error has occurred and returns a blank page if so.
-error, unsortedCircuit, Source, Sourcetype, RSval, RLval, Frequencies, OutputOrder = InputRead(FileLines)
-
-if error:
-    outputfile.close()
-    exit()
-
-#Sorts the unsorted list of circuit blocks and checks for any error occurance again.
-error, sortedCircuit = NodeSorter(unsortedCircuit)
-if error:
-    outputfile.close()
-    exit()
-
-
-
-# Starts applying the frequencies to the components
-# Calculates all values and collates all of the dictionaries in a list
-FrequencyMasterMatrix = []
-outputValueLine = []
-for FrequencyX in Frequencies:
-
-    if Fourier == False: # starts creating the frequency row values
-        outputValueLine.append(" "+"{:.3e}".format(FrequencyX)+",")
-
-    # Applies the frequencies to the circuit by individually
-    # updating each component with thier frequency and then
-    # calculating all output values.
-    FirstNode = copy.deepcopy(sortedCircuit[0])
-    FirstNode.applyFreq(FrequencyX)
-    for indexx in range(1, len(sortedCircuit)):
-        try:
-            sortedCircuit[indexx].applyFreq(FrequencyX)
-            FirstNode.multM(sortedCircuit[indexx])
-        except:
-            outputfile.close()
-            exit()
-    FrequencyMasterMatrix.append(FirstNode.calculateAll(RSval, RLval, Source, Sourcetype))
-
-
-
-
-#If in fourier mode: do the fourier transform (and if the amount of frequencies are 2 or more)
-if Fourier == True and len(Frequencies)>1:
-
-    #format the titles
-    title1a = "{message: >{width}}".format(message="TIME,", width=11)
-    line1 = title1a
-    title1b = "{message: >{width}}".format(message="Sec,", width=11)
-    line2 = title1b
-
-    FourierValues = []
-    #Calculate the time difference
-    Td = 1/((Frequencies[1]-Frequencies[0]))
-    #Create the time axis and format the time column for the output
-    time = np.linspace(0, Td, 2**FourierCoeff)
-    for timeValue in time:
-        outputValueLine.append(" "+"{:.3e}".format(timeValue)+", ")
-
-    #Perfrom the inverse fourier transform on each value
-    # going in order of the output order of variables
-    for numm in range(0, len(OutputOrder)):
-        listOfVals = []
-        for numm2 in FrequencyMasterMatrix:
-            listOfVals.append(numm2[OutputOrder[numm][0]])
-        OutputOrder[numm].append(np.fft.ifft(a=listOfVals, n=2**FourierCoeff))
-
-    #Formatting the output
-    #3 stages of formatting:
-    #Formatting the titles
-    #Formatting the units
-    #Formatting the output values
-    comma = ","
-    for h in OutputOrder:
-        if h == OutputOrder[-1]:
-            comma = ""
-        if "dB" in h[1]:
-            title1a = "{message: >{width}}".format(
-                message="|"+h[0]+"|"+",", width=12)
-            title1b = "{message: >{width}}".format(message="/_"+h[0], width=11)
-            line1 = line1+title1a+title1b+comma
-            title1a = "{message: >{width}}".format(message=h[1]+",", width=12)
-            title1b = "{message: >{width}}".format(message="rads", width=11)
-            line2 = line2+title1a+title1b+comma
+# The simulation itself is done by Run(), so the same thing can be done from
+# another Python program by importing this file (see simulate()).
+
+def main(argv):
+    # Function : main
+    # Command line entry point, for example "python Main.py input.net output.csv"
+    # or "python Main.py -i input -t 6" for a fourier transform.
+    # Batch mode runs many netlists in one go (see BatchJobs), for example
+    # "python Main.py --batch TESTFILES/*.net" or "python Main.py --batch list.txt",
+    # with --output-folder=folder to choose where the outputs go, --fourier=6
+    # for a fourier transform of each one and --jobs=8 to run 8 netlists at a
+    # time in seperate processes (--jobs=0 uses every CPU core).
+    # Inputs: [argv : String List] - the command line, argv[0] is the program name
+    # Output: [error : boolean]
+
+    Fourier = False
+    FourierCoeff = 0
+    inputName = None
+    outputName = None
+
+    #Options start with "--" and can be given anywhere on the command line,
+    # they are seperated from the file name arguments first.
+    Options = [arg for arg in argv[1:] if arg.startswith("--")]
+    Arguments = [arg for arg in argv if not arg.startswith("--")]
+
+    if len(Arguments) > 2:
+        if str(Arguments[1]) == "-i" and len(Arguments) > 4:
+            if str(Arguments[3]) == "-t":
+                Fourier = True
+                inputName = Arguments[2]+".net"
+                outputName = Arguments[2]+".csv"
+                FourierCoeff = int(Arguments[4])
         else:
-            title1a = "{message: >{width}}".format(
-                message="Re("+h[0]+"),", width=12)
-            title1b = "{message: >{width}}".format(
-                message="Im("+h[0]+")", width=11)
-            line1 = line1+title1a+title1b+comma
-            title1a = "{message: >{width}}".format(message=h[1], width=11)
-            line2 = line2+title1a+","+title1a+comma 
-        for jh in range(0, 2**FourierCoeff):
-            argu1, argu2 = ValueConvert(h[2][jh], h[1], h[0])#Using ValueConvert the program
-                                                            # converts the output into the required form
-                                                            # whether it requires it to be in dB or have an
-                                                            #exponent this function handles it all.
-            spacead = " "
-            spacead2 = " "
-            if argu1 < 0:
-                spacead = ""
-            if argu2 < 0:
-                spacead2 = ""
-            outputValueLine[jh] = outputValueLine[jh]+spacead+"{:.3e}".format(
-                argu1)+", "+spacead2+"{:.3e}".format(argu2)+comma+" "  # add second one imaginary or phase
-
-
-else:
-    #Formatting the output for a normal output
-    #Uses a predefined output value width and puts everything in scientific notation.
-    title1a = "{message: >{width}}".format(message="Freq,", width=11)
-    line1 = title1a
-    title1b = "{message: >{width}}".format(message="Hz,", width=11)
-    line2 = title1b
-
-    comma = ","
-    for h in OutputOrder:
-        if h == OutputOrder[-1]:
-            comma = ""
-        if "dB" in h[1]:
-            title1a = "{message: >{width}}".format(
-                message="|"+h[0]+"|"+",", width=12)
-            title1b = "{message: >{width}}".format(message="/_"+h[0], width=11)
-            line1 = line1+title1a+title1b+comma  # add iaginary + DB
-            title1a = "{message: >{width}}".format(message=h[1]+",", width=12)
-            title1b = "{message: >{width}}".format(message="rads", width=11)
-            line2 = line2+title1a+title1b+comma  # add second
-        else:
-            title1a = "{message: >{width}}".format(message="Re("+h[0]+"),", width=12)
-            title1b = "{message: >{width}}".format(message="Im("+h[0]+")", width=11)
-            line1 = line1+title1a+title1b+comma  # add iaginary + DB
-            title1a = "{message: >{width}}".format(message=h[1], width=11)
-            line2 = line2+title1a+","+title1a+comma  # add second
-        for jh in range(0, len(FrequencyMasterMatrix)):
-            argu1, argu2 = ValueConvert(FrequencyMasterMatrix[jh][h[0]], h[1], h[0])
-            title1a="{:.3e}".format(argu1)+","
-            title1a = "{message: >{width}}".format(message=title1a, width=12)
-            title1b="{:.3e}".format(argu2)
-            title1b = "{message: >{width}}".format(message=title1b, width=11)
-            outputValueLine[jh] = outputValueLine[jh]+title1a+title1b+comma # add second one imaginary or phase
-
-#Writing everythin to the output file and appending new lines.
-
-outputfile.writelines(line1+"\n")
-outputfile.writelines(line2+"\n")
-for wordsad in outputValueLine:
-    outputfile.writelines(wordsad+"\n")
-outputfile.close()
-
-
+            inputName = Arguments[1]
+            outputName = Arguments[2]
 
+    if "--batch" in Options:
+        FourierCoeff = OptionValue(Options, "--fourier", None)
+        missing, Jobs = BatchJobs(Arguments[1:], OptionValue(Options, "--output-folder", None))
+        try:
+            Processes = int(OptionValue(Options, "--jobs", 1))
+        except ValueError:
+            print("Invalid --jobs value: %s" % OptionValue(Options, "--jobs", 1))
+            return True
+        if Processes <= 0:
+            Processes = os.cpu_count() or 1
+        if FourierCoeff is None:
+            return (RunBatch(Jobs, False, 0, Options, Processes) > 0) or missing
+        try:
+            FourierCoeff = int(FourierCoeff)
+        except ValueError:
+            print("Invalid --fourier value: %s" % FourierCoeff)
+            return True
+        return (RunBatch(Jobs, True, FourierCoeff, Options, Processes) > 0) or missing
+
+    #Test Mode
+    if len(Arguments)>1:
+        if str(Arguments[1]) == "Test":
+            #The tests are only loaded when they are needed
+            import doctest
+            from Testing import Testing
+            doctest.testmod(sys.modules[__name__])
+            Testing()
+            return False
+
+    #Checks if the input and the output file names have been declared.
+    if inputName is None:
+        print("No Input File")
+        return True
+
+    return Run(inputName, outputName, Fourier, FourierCoeff, Options)
 
 
 if __name__ == '__main__':
-    import doctest
-    doctest.testmod()
\ No newline at end of file
+    sys.exit(1 if main(sys.argv) else 0)
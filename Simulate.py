@@ -0,0 +1,12 @@
+#Quick start entry point, used exactly like Main.py:
+#   python Simulate.py input.net output.csv
+#   python Simulate.py -i input -t 6
+# Main is imported as a module here, so Python keeps it compiled in __pycache__
+# instead of compiling all of Main.py again on every run. Use this one when
+# running lots of small netlists from a script, where start up is most of the time.
+
+import sys
+from Main import main
+
+if __name__ == '__main__':
+    sys.exit(1 if main(sys.argv) else 0)
@@ -0,0 +1,93 @@
+#Start up benchmark: times how long the simulator takes from starting Python to
+# writing the first row of results for a small netlist. When lots of tiny netlists
+# are run one process at a time this is nearly all of the run time.
+# Also lists the slowest imports, the same as "python -X importtime" would.
+# Only what a run doesnt need is imported lazily (the tests, doctest and the thread
+# pool). numpy, re and copy are still imported with Main, as every simulation uses
+# them from reading the netlist onwards, so numpy is most of the start up left.
+#
+# Usage: python StartupBenchmark.py [netlist] [repeats]
+
+import sys
+import os
+import time
+import statistics
+import subprocess
+import tempfile
+
+Folder = os.path.dirname(os.path.abspath(__file__))
+
+
+def FirstRowTime(command, outputName):
+    # Function : FirstRowTime
+    # Runs a command and watches the output file until the first row of results
+    # (the line after the titles and the units) has been written.
+    # Inputs: [command : String List], [outputName : String]
+    # Output: [firstRow : float] - seconds, None if no row was written, [total : float] - seconds
+    if os.path.exists(outputName):
+        os.remove(outputName)
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=Folder, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    firstRow = None
+    while firstRow is None:
+        finished = process.poll() is not None
+        try:
+            with open(outputName) as filee:
+                if filee.read().count("\n") >= 3:
+                    firstRow = time.perf_counter()-start
+        except OSError:
+            pass
+        if finished:
+            break
+        time.sleep(0.0005)
+    process.wait()
+    return firstRow, time.perf_counter()-start
+
+def ImportTimes(command):
+    # Function : ImportTimes
+    # Runs a command with "-X importtime" and collects the time of each import made
+    # by the program and by the modules it imports directly.
+    # Inputs: [command : String List] - without the python executable
+    # Output: [times : List of (float, String)] - cumulative milliseconds and module name, slowest first
+    run = subprocess.run([sys.executable, "-X", "importtime"]+command, cwd=Folder,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    times = []
+    for line in run.stderr.split("\n"):
+        parts = line.split("|")
+        #Nested imports are indented by two more spaces for each level
+        if len(parts) == 3 and parts[0].startswith("import time:") and not parts[2].startswith("     "):
+            try:
+                times.append((int(parts[1])/1000, parts[2].strip()))
+            except ValueError:
+                pass
+    return sorted(times, reverse=True)
+
+def Median(values):
+    values = [v for v in values if v is not None]
+    if values == []:
+        return None
+    return statistics.median(values)
+
+def Seconds(value):
+    if value is None:
+        return "%10s" % "-"
+    return "%8.3f s" % value
+
+
+if __name__ == '__main__':
+    netlist = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else os.path.join(Folder, "TESTFILES", "a_Test_Circuit_1C.net")
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    outputName = os.path.join(tempfile.mkdtemp(), "startup.csv")
+
+    print("Start up benchmark: %s, median of %d runs" % (netlist, repeats))
+    print("%-22s %10s %10s" % ("", "first row", "total"))
+    for label, command in [("python (nothing)", ["-c", "pass"]),
+                           ("import numpy", ["-c", "import numpy"]),
+                           ("Main.py", ["Main.py", netlist, outputName]),
+                           ("Simulate.py", ["Simulate.py", netlist, outputName])]:
+        runs = [FirstRowTime([sys.executable]+command, outputName) for _ in range(repeats)]
+        print("%-22s %10s %10s" % (label, Seconds(Median([r[0] for r in runs])), Seconds(Median([r[1] for r in runs]))))
+
+    print("\nSlowest imports (Simulate.py):")
+    for milliseconds, name in ImportTimes(["Simulate.py", netlist, outputName])[:10]:
+        print("  %-30s %8.1f ms" % (name, milliseconds))
@@ -0,0 +1,750 @@
+#Unit tests for Main.py, kept in thier own file so the simulator doesnt have to
+# load them every time it runs. Run with "python Main.py Test" or "python Testing.py".
+
+from Main import *
+
+
+#UNIT TESTING
+def Testing():
+    #Cannot Use Doctest as these are too complex and require outside files.
+
+    
+    print("Class 'circuitBlock' Test Started:")
+    fail=False
+    #This is from prior knowledge, i know all variables are stored in this order.
+    #It will be used to extract the output order in the excel file
+    allTerms=["Vin", "Vout", "Iin", "Iout", "Pin", "Pout", "Zin", "Zout", "Av", "Ai"]
+    #The test data isnt in the repository, so this test is skipped without it
+    if not os.path.exists("TestingData.csv"):
+        print("Skipped, TestingData.csv not found\n")
+    else:
+        TestFile=open("TestingData.csv","r")
+        for LineNum,TestFileLine in enumerate(TestFile):
+            linein=TestFileLine.replace("\n","").split(",")
+            if LineNum%5==1:#Every 5n+1 line
+            
+                #Known Order Save all values from the file in thier corresponding variables
+                n1=int(linein[0])
+                n2=int(linein[1])
+                Rs=float(linein[2])
+                Rl=float(linein[3])
+                Frqs=float(linein[4])
+                CompN=linein[5]
+                CompV=float(linein[6])
+                SrcType=int(linein[7])
+                SrcVal=float(linein[8])
+
+                #Create a component depending on the variables above
+                Node=circuitBlock(n1,n2,CompN,CompV)
+            if LineNum%5==3:#Every 5n+3 line
+                works=False
+                try:#Uses try to check if its computable
+
+                    #applies a frequency and calculates all outputs depending on the file input
+                    Node.applyFreq(Frqs)
+                    answer=Node.calculateAll(Rs,Rl,SrcVal,SrcType)
+                    works=True
+                except:
+                    #If there was an error, the file should also show error - otherwise it fails the test
+                    if linein[0]!="error":#TODO: Doctest
+                        fail=True
+                if works == True:
+                    listOfAnswers=[answer[allTermsx] for allTermsx in allTerms]#Iterates through each value in file
+                    #and stores it in an array
+
+                    #Compares every output in the file agains the output from the calculateAll dictionary values
+                    # If any arent matching, the boolean fail will be true.
+                    for count,compareVal in enumerate(listOfAnswers):
+                        compareValRound=round(compareVal.real,5)+round(compareVal.imag,5)*1j
+                        if compareValRound != complex(linein[count]):#TODO:DOCTEST
+                            fail=True
+
+        #Final Result
+        if fail:
+            print("Test Failed\n")
+        else:
+            print("All Tests Passed\n")
+        TestFile.close()
+    
+    original=[]
+    Test2=[]
+    TestFile2=open("ValidFile.net","r")
+    for Tline in TestFile2:
+        Test2.append(Tline.replace("\n", ""))
+        original.append(Tline.replace("\n", ""))
+    TestFile2.close()
+
+
+
+    print("Class 'circuitBlock' Test Multiple Elements:")#multiple elements
+    fail=False
+    Rs=50
+    Rl=50
+    Vs=5
+    A = circuitBlock(1, 0, "R", 150)
+    B = circuitBlock(1, 2, "R", 150)
+    A.applyFreq()
+    B.applyFreq()
+    A.multM(B)
+    answersTest=[3.2,0.79,0.037,0.016,0.12,0.012,86,190,0.25,0.43]
+    dictOut=A.calculateAll(Rs, Rl, Vs, 1)
+    for indexx,nameDict in enumerate(allTerms):
+        compareVal=dictOut[nameDict]
+        compareValRound=float("{:.1e}".format(compareVal.real))
+        if compareValRound!=answersTest[indexx]:
+            fail=True
+    if fail:
+        print("Test Failed\n")
+    else:
+        print("Test Passed\n")
+
+
+    print("Valid Test 1 for InputRead()")
+    error, Circ, Source, Sourcetype, RSval, RLval, Frequencies, OutOrd=InputRead(Test2)
+
+    t1f=False
+
+    correctOrd=[['Vin', 'V'], ['Vout', 'V'], ['Iin', 'A'], ['Iout', 'A'], ['Pin', 'W'], ['Zout', 'Ohms'], ['Pout', 'W'], ['Zin', 'Ohms'], ['Av', 'L'], ['Ai', 'L']]
+    if OutOrd!=correctOrd:
+        t1f=True
+    
+    if len(Circ)!=10:
+        t1f=True
+    correct=[[4,0,82],[4,5,25000],[2,0,1e-05],[2,3,150],[4,0,1.25e-05],[6,0,100],[5,6,2],[3,4,3.3],[5,0,3e-09],[1,2,47000]]
+    for g in range(0,10):
+        comparex=[Circ[g].n1,Circ[g].n2,Circ[g].val]
+        if comparex!=correct[g]:
+            t1f=True
+
+    if error or t1f or Source !=5 or Sourcetype != 1 or RSval != 50 or RLval != 75 or (Frequencies != [10,20,30,40]).any():
+        print("Failed")
+    else:
+
+        print("Passed")
+    
+
+
+
+
+
+    print("Valid Test 2 for InputRead()")
+    #Modifying the file so all definitions are on the same line and
+    # It uses a logarithmic sweep
+    for _ in range(0,6):
+        Test2.pop(21)
+    Test2[21]=Test2[21].replace("#","")
+    _, _, _, _, _, _, Frequencies, _=InputRead(Test2)
+    if np.array_equal(Frequencies, [10,100,1000,10000,100000,1000000,10000000]):
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("\nInvalid tests inside <circuit> tag:\n")
+    print("Invalid Test 3 for InputRead()")
+    Test3=original.copy()
+    Test3[0]=""
+    error, _, _, _, _, _, _, _=InputRead(Test3)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+    
+    print("Invalid Test 4 for InputRead()")
+    Test=original.copy()
+    Test[1]="n1=3.5 n2=4 R=1"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+    print("Invalid Test 5 for InputRead()")
+    Test=original.copy()
+    Test[1]="n1=3 n2=4.5 R=1"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Invalid Test 6 for InputRead()")
+    Test=original.copy()
+    Test[1]="n1=3 n2=4 R=-1"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Invalid Test 7 for InputRead()")
+    Test=original.copy()
+    Test[1]="n1=3 n2=4 C=kx"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+    print("Invalid Test 8 for InputRead()")
+    Test=original.copy()
+    Test[1]="n1=3 n2=4"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Invalid Test 9 for InputRead()")
+    Test=original.copy()
+    Test[1]="n2=4 R=1"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+    print("Invalid Test 10 for InputRead()")
+    Test=original.copy()
+    Test[1]="n1=4 R=1"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Invalid Test 11 for InputRead()")
+    Test=original.copy()
+    Test[1]="n1.=3 n2=4 R=1"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Invalid Test 11 for InputRead()")
+    Test=original.copy()
+    Test[1]="n1=3 n2 =4 R=1"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Invalid Test 11.1 for InputRead()")
+    Test=original.copy()
+    Test[1]="n1=3 n2=4 yol R=1"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    
+    print("Invalid Test 11.2 for InputRead()")
+    Test=original.copy()
+    Test[1]="n1=3 n2=4 R=1 k k"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Invalid Test 11.3 for InputRead()")
+    Test=original.copy()
+    Test[1]="n1=3 n2=4 R=1 hello"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+
+    print("\nInvalid Tests for <TERMS> tag:\n")
+    print("Invalid Test 12 for InputRead()")
+    Test=original.copy()
+    Test[20]="VT="
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Invalid Test 13 for InputRead()")
+    Test=original.copy()
+    Test[21]="RS=abc"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+
+    print("Invalid Test 14 for InputRead()")
+    Test=original.copy()
+    Test[22]="RL=-3"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Invalid Test 15 for InputRead()")
+    Test=original.copy()
+    Test[23]="Fstart=100sr"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Invalid Test 16 for InputRead()")
+    Test=original.copy()
+    Test[24]="Fend=-123"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+
+    print("Invalid Test 17 for InputRead()")
+    Test=original.copy()
+    Test[25]="Nfreqs=1.2"
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+    print("Invalid Test 18 for InputRead()")
+    Test=original.copy()
+    Test[27]=""#no tag
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+
+
+
+    print("\nInvalid Tests for <OUTPUT> tag:\n")
+    print("Invalid Test 19 for InputRead()")
+    Test=original.copy()
+    Test[41]=""
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Invalid Test 20 for InputRead()")
+    Test=original.copy()
+    for i in range(31,41):
+        Test[i]=Test[i].upper()
+    error, _, _, _, _, _, _, _=InputRead(Test)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+
+
+    print("Valid Tests for Node Sorter")
+
+    originalList=[]
+    originalList.append(circuitBlock(1, 2,"L",0))
+    originalList.append(circuitBlock(2, 0,"R",1))
+    originalList.append(circuitBlock(2, 0,"R",2))
+    originalList.append(circuitBlock(2, 3, "R",3))
+    originalList.append(circuitBlock(3, 4, "R",4))
+    originalList.append(circuitBlock(4, 0, "G",5))
+    originalList.append(circuitBlock(4, 0, "R",6))
+    originalList.append(circuitBlock(4, 0, "R",7))
+    originalList.append(circuitBlock(4, 0, "R",8))
+    originalList.append(circuitBlock(4, 5, "R",9))
+    originalList.append(circuitBlock(5, 0, "C",10))
+    originalList.append(circuitBlock(5, 6, "G",11))
+    originalList.append(circuitBlock(6, 7, "R",12))
+    originalList.append(circuitBlock(7, 8, "R",13))
+    originalList.append(circuitBlock(8, 9, "R",14))
+    originalList.append(circuitBlock(9, 0, "R",15))
+    originalList.append(circuitBlock(9, 0, "R",16))
+    originalList.append(circuitBlock(9, 0, "R",17))
+    originalList.append(circuitBlock(9, 0, "R",18))
+    originalList.append(circuitBlock(10, 11, "R",19))
+    
+
+    fail=False
+    shuffled=originalList.copy()
+    import random
+    for i in range(0,20):
+        random.shuffle(shuffled)
+        _,sort=NodeSorter(shuffled)
+        for indx,tst in enumerate(originalList):
+            if tst.n1 != sort[indx].n1: # Compares the first node
+                                        # to the original list first node
+                fail=True
+            if tst.n2 != sort[indx].n2: # Compares the second node
+                                        # to the original list second node
+                fail=True
+
+    if fail==True:
+        print("Failed")
+    else:
+        print("Passed")
+
+    
+    shuffled.append(circuitBlock(5, 6, "G",11))
+    error,_=NodeSorter(shuffled)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+    shuffled.pop()
+    
+    shuffled.append(circuitBlock(-3, 3, "C",23))
+    error,_=NodeSorter(shuffled)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+    shuffled.pop()
+
+    shuffled.append(circuitBlock(3, 3, "C",23))
+    error,_=NodeSorter(shuffled)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+    shuffled.pop()
+
+    shuffled.append(circuitBlock(1, 1, "C",23))
+    error,_=NodeSorter(shuffled)
+    if error:
+        print("Passed")
+    else:
+        print("Failed")
+    shuffled.pop()
+
+    print("\nStarting ValueConvert() Valid Tests")
+
+    if ValueConvert("3k") == 3000:
+        print("Passed")
+    else:
+        print("Fail")
+    
+    if ValueConvert("3u") == 3e-6:
+        print("Passed")
+    else:
+        print("Fail")
+    
+    if ValueConvert("1.234567M") == 1234567:
+        print("Passed")
+    else:
+        print("Fail")
+    
+    if ValueConvert("0p") == 0:
+        print("Passed")
+    else:
+        print("Fail")
+    
+    if ValueConvert("500") == 500:
+        print("Passed")
+    else:
+        print("Fail")
+    
+    if ValueConvert("3e-3m") == 3e-6:
+        print("Passed")
+    else:
+        print("Fail")
+
+    
+    if ValueConvert("3e-3 m") == 3e-6:
+        print("Passed")
+    else:
+        print("Fail")
+    
+    if ValueConvert("0.0001 M") == 1000:
+        print("Passed")
+    else:
+        print("Fail")
+    
+    print("ValueConvert() invalid cases")
+
+
+    if ValueConvert("10uu") == "error":
+        print("Passed")
+    else:
+        print("Fail")
+
+    if ValueConvert("10uk") == "error":
+        print("Passed")
+    else:
+        print("Fail")
+
+
+    if ValueConvert("106K") == "error":
+        print("Passed")
+    else:
+        print("Fail")
+
+
+    if ValueConvert("ten k") == "error":
+        print("Passed")
+    else:
+        print("Fail")
+
+
+    if ValueConvert("1k.1") == "error":
+        print("Passed")
+    else:
+        print("Fail")
+        
+    if ValueConvert("10 1k") == "error":
+        print("Passed")
+    else:
+        print("Fail")
+    
+    
+    print("\nStarting ValueConvert() Valid Tests for output side:")
+    
+    
+    if ValueConvert(3,"V","Vin") == (3,0):
+        print("Passed")
+    else:
+        print("Fail")
+
+
+    if (ValueConvert(1,"dB","Vin")) == (0,0):
+        print("Passed")
+    else:
+        print("Fail")
+    if (ValueConvert(100,"dBu","Vin")) == (160.0,0.0):
+        print("Passed")
+    else:
+        print("Fail")
+    if (ValueConvert(1000,"dBm","Vin")) == (120.0, 0.0):
+        print("Passed")
+    else:
+        print("Fail")
+    if (ValueConvert(100j,"dB","Pin")) == (20.0, 1.5707963267948966):
+        print("Passed")
+    else:
+        print("Fail")
+    if (ValueConvert(25+25j,"dB","Pout")) == (15.484550065040281, 0.7853981633974483):
+        print("Passed")
+    else:
+        print("Fail")
+    if (ValueConvert(25+25j,"kV","Iout")) == (0.025, 0.025):
+        print("Passed")
+    else:
+        print("Fail")
+    if (ValueConvert(20+30j,"dBK","Zin")) == (31.13943352306837, 0.982793723247329):
+        print("Passed")
+    else:
+        print("Fail")
+    if (ValueConvert(2500+25j,"mOhms","Zout")) == (2500000.0, 25000.0):
+        print("Passed")
+    else:
+        print("Fail")
+
+
+    print("\nBatched sweep against the scalar sweep:")
+    _, Circ, Source, Sourcetype, RSval, RLval, Frequencies, _=InputRead(original)
+    _, Circ=NodeSorter(Circ)
+    scalarValues=ScalarSweep(Circ, Frequencies, RSval, RLval, Source, Sourcetype)
+    batchedValues=BatchedSweep(circuitTable(Circ), Frequencies, RSval, RLval, Source, Sourcetype)
+    fail=False
+    for nameDict in allTerms:
+        if not np.allclose(scalarValues[nameDict],batchedValues[nameDict],rtol=1e-12,atol=1e-30):
+            fail=True
+    if fail:
+        print("Failed")
+    else:
+        print("Passed")
+
+    print("Tree reduction against the chain product:")
+    if np.allclose(CascadeTree(circuitTable(Circ), Frequencies), CascadeChain(circuitTable(Circ), Frequencies), rtol=1e-12, atol=0):
+        print("Passed")
+    else:
+        print("Failed")
+
+    print("Folded circuit against the unfolded circuit:")
+    folded=FoldConstant(Circ)
+    if len(folded)<len(Circ) and np.allclose(CascadeChain(circuitTable(folded), Frequencies), CascadeChain(circuitTable(Circ), Frequencies), rtol=1e-12, atol=0):
+        print("Passed")
+    else:
+        print("Failed")
+
+    print("simulate() against the sweep:")
+    error, Result=simulate(original)
+    if not error and all(np.allclose(Result["Values"][h[0]], batchedValues[h[0]], rtol=1e-12, atol=1e-30) for h in Result["OutputOrder"]):
+        print("Passed")
+    else:
+        print("Failed")
+
+    print("Usual component lines against the other spellings:")
+    quick=InputRead(["<CIRCUIT>","n1=1 n2=2 R=25k","N1=2 n2=0 c=10n","</CIRCUIT>","<TERMS>","VT=5 RS=50 RL=75","Fstart=1 Fend=10 Nfreqs=3","</TERMS>","<OUTPUT>","Vin V","</OUTPUT>"])
+    spelled=InputRead(["<CIRCUIT>","R=25 k n2=2 n1=+1 # comment","n2=0 C=10 n n1=0_2","</CIRCUIT>","<TERMS>","VT=5 RS=50 RL=75","Fstart=1 Fend=10 Nfreqs=3","</TERMS>","<OUTPUT>","Vin V","</OUTPUT>"])
+    if not quick[0] and not spelled[0] and [(c.n1,c.n2,c.type,c.val) for c in quick[1]]==[(c.n1,c.n2,c.type,c.val) for c in spelled[1]]:
+        print("Passed")
+    else:
+        print("Failed")
+
+    print("ValueConvertArray() against ValueConvert():")
+    values=["3k","3u","1.234567M","0p","500","3e-3m","3e-3 m","0.0001 M","inf","nan","10uu","10uk","106K","ten k","1k.1","10 1k",""]
+    errors, numbers=ValueConvertArray(values)
+    single=[ValueConvert(value) for value in values]
+    if [error for error in errors]==[value=="error" for value in single] and all(np.isnan(n) and np.isnan(v) or n==v for n, v, e in zip(numbers, single, errors) if not e):
+        print("Passed")
+    else:
+        print("Failed")
+
+    print("Netlist from the cache against the netlist read again:")
+    import tempfile
+    cacheFolder=tempfile.mkdtemp()
+    _, first=simulate(original, Options=["--cache="+cacheFolder])
+    _, cached=simulate(original, Options=["--cache="+cacheFolder])
+    if len(os.listdir(cacheFolder))==1 and all(np.array_equal(first["Values"][h[0]], cached["Values"][h[0]]) for h in first["OutputOrder"]):
+        print("Passed")
+    else:
+        print("Failed")
+
+    print("Compiled netlist against the text netlist:")
+    compiledName=os.path.join(tempfile.mkdtemp(), "circuit.cnet")
+    error=CompileNetlist(original, compiledName)
+    _, compiled=simulate(compiledName)
+    _, decompiled=DecompileNetlist(compiledName)
+    _, again=simulate(decompiled)
+    if not error and all(np.array_equal(first["Values"][h[0]], compiled["Values"][h[0]]) and np.array_equal(first["Values"][h[0]], again["Values"][h[0]]) for h in first["OutputOrder"]):
+        print("Passed")
+    else:
+        print("Failed")
+
+    print("Termination sweep against one run for each termination:")
+    sweepLines=[line.replace("RL=75", "RL=75,100:200:2") for line in original]
+    error, swept=simulate(sweepLines)
+    fail=error or len(swept["Terminations"][1][2])!=3
+    for k, load in enumerate([75, 100, 200]):
+        _, single=simulate([line.replace("RL=75", "RL=%d" % load) for line in original])
+        for h in single["OutputOrder"]:
+            if not np.allclose(swept["Values"][h[0]][:, k], single["Values"][h[0]], rtol=1e-12, atol=1e-30):
+                fail=True
+    if fail:
+        print("Failed")
+    else:
+        print("Passed")
+    print("Monte carlo with no tolerance against the normal run:")
+    error, nominal=simulate(original)
+    error2, bands=simulate(original, Options=["--montecarlo=20", "--tol=0", "--percentiles=5,95"])
+    fail=error or error2
+    for band, h in zip(bands["Bands"], bands["OutputOrder"]):
+        if not np.allclose(band, nominal["Values"][h[0]][:, None], rtol=1e-9, atol=1e-30):
+            fail=True
+    #The same seed gives the same samples
+    _, first=simulate(original, Options=["--montecarlo=50", "--tol=5%", "--seed=7"])
+    _, second=simulate(original, Options=["--montecarlo=50", "--tol=5%", "--seed=7"])
+    if fail or not all(np.array_equal(a, b) for a, b in zip(first["Bands"], second["Bands"])):
+        print("Failed")
+    else:
+        print("Passed")
+
+    print("Streamed output against the normal output:")
+    outputFolder=tempfile.mkdtemp()
+    fail=False
+    for netlistName in ["TESTFILES/e_Ladder_100.net", "TESTFILES/d_LPF_B50.net", "ValidFile.net"]:
+        normalName=os.path.join(outputFolder, "normal.csv")
+        streamedName=os.path.join(outputFolder, "streamed.csv")
+        error=Run(netlistName, normalName)
+        error2=Run(netlistName, streamedName, Options=["--stream", "--chunk=3"])
+        normalFile=open(normalName, "r")
+        streamedFile=open(streamedName, "r")
+        if error or error2 or normalFile.read()!=streamedFile.read():
+            fail=True
+        normalFile.close()
+        streamedFile.close()
+    if fail:
+        print("Failed")
+    else:
+        print("Passed")
+
+    print("PlanExecution() engine and chunk choices:")
+    fail=False
+    #Few frequencies use the scalar loop, long circuits with few frequencies the tree
+    if PlanExecution(4, 2, 3)["engine"]!="scalar" or PlanExecution(2000, 10, 3)["engine"]!="tree" or PlanExecution(10, 1000, 3)["engine"]!="chain":
+        fail=True
+    #Options force the choices
+    if PlanExecution(4, 2, 3, Options=["--tree"])["engine"]!="tree" or PlanExecution(10, 10**6, 3, Options=["--scalar", "--workers=4"])["workers"]!=1:
+        fail=True
+    Plan=PlanExecution(10, 100, 3, Options=["--chunk=7"])
+    if Plan["chunk"]!=7 or Plan["chunks"]!=15 or Plan["stream"]:
+        fail=True
+    #Streaming for a sweep too big for the memory limit, but never in fourier mode
+    Plan=PlanExecution(10, 10**6, 3, Options=["--memory-limit=1"])
+    if not Plan["stream"] or Plan["chunk"]*Plan["chunks"]<10**6 or PlanExecution(10, 100, 3, True, ["--stream"])["stream"]:
+        fail=True
+    #The chunks put together give the same result as one sweep
+    for engine in ["--scalar", "--chain", "--tree"]:
+        _, chunked=simulate(original, Options=[engine, "--chunk=3"])
+        if not all(np.allclose(chunked["Values"][h[0]], batchedValues[h[0]], rtol=1e-12, atol=1e-30) for h in chunked["OutputOrder"]):
+            fail=True
+    if fail:
+        print("Failed")
+    else:
+        print("Passed")
+
+    print("Batch mode with a glob, a manifest and an invalid netlist:")
+    batchFolder=tempfile.mkdtemp()
+    invalid=original.copy()
+    invalid[1]="n1=3 n2=4 R=-1"
+    for netlistName, lines in [("good.net", original), ("bad.net", invalid)]:
+        netlistFile=open(os.path.join(batchFolder, netlistName), "w")
+        netlistFile.write("\n".join(lines)+"\n")
+        netlistFile.close()
+    manifestName=os.path.join(batchFolder, "list.txt")
+    manifestFile=open(manifestName, "w")
+    manifestFile.write("# good and bad\ngood.net named.csv\n\nbad.net\n")
+    manifestFile.close()
+    missing, globJobs=BatchJobs([os.path.join(batchFolder, "*.net")])
+    missing2, manifestJobs=BatchJobs([manifestName])
+    missing3, _=BatchJobs([os.path.join(batchFolder, "*.none"), os.path.join(batchFolder, "none.txt")])
+    fail=missing or missing2 or not missing3 or len(globJobs)!=2
+    if manifestJobs!=[(os.path.join(batchFolder, "good.net"), os.path.join(batchFolder, "named.csv")),
+                      (os.path.join(batchFolder, "bad.net"), os.path.join(batchFolder, "bad.csv"))]:
+        fail=True
+    #One bad netlist is counted and the rest of the batch still runs
+    if RunBatch(globJobs+manifestJobs)!=2:
+        fail=True
+    for outputName, blank in [("good.csv", False), ("named.csv", False), ("bad.csv", True)]:
+        outputFile=open(os.path.join(batchFolder, outputName), "r")
+        if (outputFile.read()=="")!=blank:
+            fail=True
+        outputFile.close()
+    if fail:
+        print("Failed")
+    else:
+        print("Passed")
+
+
+
+
+if __name__ == '__main__':
+    Testing()